@@ -0,0 +1,303 @@
+# ann_index.py
+# Approximate nearest neighbour (IVF) index over an EmbeddingStore
+#
+# Run directly to print a recall-vs-brute-force report for the embeddings in
+# the local embedding cache:
+#   python ann_index.py [--sqlite] [--lists N] [--probes 1,2,4,...] [--queries 200] [--k 10]
+
+import os
+import time
+import argparse
+import numpy as np
+
+from similarity import top_k_indices
+
+ANN_INDEX_FILE = "ann_ivf.npz"
+DEFAULT_TARGET_RECALL = 0.95  # recall@10 that build() tunes n_probe for
+TUNE_QUERIES = 50
+
+
+def _normalize_rows(matrix, norms=None):
+    """Return matrix rows scaled to unit length (zero rows stay zero)."""
+    if norms is None:
+        norms = np.linalg.norm(matrix, axis=1)
+    norms = np.where(norms > 0, norms, 1).astype(np.float32)
+    return np.asarray(matrix, dtype=np.float32) / norms[:, np.newaxis]
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means centroids plus one posting list per centroid.
+
+    A query is compared to every centroid, then scored exactly against the
+    rows of the n_probe closest lists only. n_lists and n_probe trade recall
+    for latency: more lists make each list shorter, more probes raise recall.
+    Rows added to the store after the index was built are searched by brute
+    force, so results stay complete until the next rebuild.
+    """
+
+    def __init__(self, centroids, order, offsets, n_rows, last_id, n_probe=8):
+        self.centroids = centroids  # (n_lists, dim) unit vectors
+        self.order = order          # store rows grouped by list
+        self.offsets = offsets      # list i owns order[offsets[i]:offsets[i + 1]]
+        self.n_rows = n_rows        # store rows covered by the index
+        self.last_id = last_id      # story id of row n_rows - 1, to detect a rebuilt store
+        self.n_probe = n_probe
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, store, n_lists=None, n_probe=None, n_iter=10, sample_size=50000, seed=0, chunk_size=20000,
+              target_recall=DEFAULT_TARGET_RECALL):
+        """Cluster the store's embeddings and build the posting lists.
+
+        How many lists a query must probe for good recall depends on how
+        clustered the embeddings are, so by default n_probe is tuned here:
+        the smallest power of two (or all lists) whose recall@10 on sampled
+        stories reaches target_recall.
+
+        Args:
+            store: EmbeddingStore to index
+            n_lists: Number of clusters (default: about 4 * sqrt(rows))
+            n_probe: Default number of lists searched per query (default: tuned)
+            n_iter: k-means iterations
+            sample_size: Rows sampled to train the centroids
+            seed: Random seed for sampling and initialisation
+            chunk_size: Rows assigned per matrix product (bounds memory)
+            target_recall: Recall the tuned n_probe must reach
+
+        Returns:
+            IVFIndex, or None if the store is empty
+        """
+        ids, matrix, norms = store.snapshot()
+        n = len(ids)
+        if n == 0:
+            return None
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+        rng = np.random.default_rng(seed)
+
+        sample_rows = np.sort(rng.choice(n, size=min(n, max(sample_size, n_lists)), replace=False))
+        sample = _normalize_rows(matrix[sample_rows], norms[sample_rows])
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assignment, minlength=n_lists)
+            # Per-cluster sums via one sort + reduceat instead of np.add.at
+            grouped = sample[np.argsort(assignment, kind='stable')]
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            sums = np.zeros_like(centroids)
+            nonempty = counts > 0
+            sums[nonempty] = np.add.reduceat(grouped, starts[nonempty], axis=0)
+            empty = counts == 0
+            if empty.any():
+                # Re-seed empty clusters on random sample points
+                sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+            centroids = _normalize_rows(sums)
+
+        assignment = np.empty(n, dtype=np.int64)
+        for start in range(0, n, chunk_size):
+            end = min(start + chunk_size, n)
+            assignment[start:end] = np.argmax(matrix[start:end] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(assignment, minlength=n_lists), out=offsets[1:])
+        index = cls(centroids, order, offsets, n, int(ids[n - 1]), n_probe=n_probe or 1)
+        if n_probe is None:
+            index.n_probe = index.tune(store, target_recall, seed=seed)
+        return index
+
+    def tune(self, store, target_recall=DEFAULT_TARGET_RECALL, n_queries=TUNE_QUERIES, k=10, seed=0):
+        """Smallest n_probe (1, 2, 4, ... or every list) reaching target_recall on sampled stories."""
+        probes = [1 << i for i in range(int(np.log2(self.n_lists)) + 1)]
+        if probes[-1] < self.n_lists:
+            probes.append(self.n_lists)
+        report = recall_report(store, self, n_queries, k, probes, seed=seed, target_recall=target_recall)
+        return report[-1]['n_probe'] if report else self.n_lists
+
+    def covers(self, store):
+        """True if the index was built over the first n_rows rows of store."""
+        ids = store.snapshot()[0]
+        return len(ids) >= self.n_rows and self.n_rows > 0 and int(ids[self.n_rows - 1]) == self.last_id
+
+    def candidate_rows(self, query_embedding, n_probe=None, n_rows=None):
+        """Store rows to score for a query: the probed lists plus the unindexed tail."""
+        n_probe = min(n_probe or self.n_probe, self.n_lists)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        lists = top_k_indices(self.centroids @ query, n_probe)
+        rows = [self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists]
+        if n_rows is not None and n_rows > self.n_rows:
+            rows.append(np.arange(self.n_rows, n_rows, dtype=np.int64))
+        return np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+
+    def find_k_most_similar(self, store, query_embedding, k=5, exclude_query_id=None, n_probe=None):
+        """Approximate top-k search with the same contract as EmbeddingStore.find_k_most_similar.
+
+        Args:
+            store: EmbeddingStore the index was built over
+            query_embedding: The embedding vector for the query story
+            k: Number of most similar stories to return
+            exclude_query_id: Story ID to exclude from results (the query story itself)
+            n_probe: Lists to search (default: the index's n_probe)
+
+        Returns:
+            List of tuples: [(story_id, similarity_score), ...] sorted by similarity (descending)
+        """
+        if query_embedding is None or len(query_embedding) == 0:
+            return []
+        ids = store.snapshot()[0]
+        rows = self.candidate_rows(query_embedding, n_probe, len(ids))
+        if exclude_query_id is not None:
+            rows = rows[ids[rows] != exclude_query_id]
+        scores = store.scores(query_embedding, rows)
+        top = top_k_indices(scores, k)
+        return list(zip(ids[rows[top]].tolist(), scores[top].tolist()))
+
+    def save(self, path):
+        """Write the index to an .npz file (atomically)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            order=self.order,
+            offsets=self.offsets,
+            meta=np.array([self.n_rows, self.last_id, self.n_probe], dtype=np.int64),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, store=None):
+        """Read an index saved by save().
+
+        Returns:
+            IVFIndex, or None if the file is missing, unreadable, or was
+            built over different rows than store
+        """
+        try:
+            with np.load(path) as data:
+                n_rows, last_id, n_probe = (int(v) for v in data['meta'])
+                index = cls(data['centroids'], data['order'], data['offsets'], n_rows, last_id, n_probe)
+        except (OSError, ValueError, KeyError):
+            return None
+        if store is not None and not index.covers(store):
+            return None
+        return index
+
+
+def load_or_build_index(store, cache_dir, rebuild_fraction=0.2, n_lists=None, n_probe=None, **build_args):
+    """Load the persisted index for a store, rebuilding it when stale.
+
+    The index is rebuilt (and saved) when none exists, when it was built over
+    different rows or with a different n_lists than asked for, or when more
+    than rebuild_fraction of the store is in the brute-force tail.
+
+    Args:
+        store: EmbeddingStore to index
+        cache_dir: Directory holding ann_ivf.npz (normally the embedding cache dir)
+        rebuild_fraction: Unindexed fraction of rows that triggers a rebuild
+        n_lists: Number of lists (default: IVFIndex.build's)
+        n_probe: Lists searched per query, overriding the n_probe tuned at
+                 build time (not saved with the index)
+        **build_args: Passed to IVFIndex.build
+
+    Returns:
+        IVFIndex, or None if the store is empty
+    """
+    path = os.path.join(cache_dir, ANN_INDEX_FILE)
+    index = IVFIndex.load(path, store)
+    if (index is None or len(store) - index.n_rows > rebuild_fraction * len(store)
+            or (n_lists is not None and index.n_lists != min(n_lists, index.n_rows))):
+        index = IVFIndex.build(store, n_lists=n_lists, **build_args)
+        if index is None:
+            return None
+        try:
+            index.save(path)
+        except OSError:
+            pass  # Still usable for this session
+    if n_probe is not None:
+        index.n_probe = n_probe
+    return index
+
+
+def recall_report(store, index, n_queries=200, k=10, n_probes=(1, 2, 4, 8, 16, 32, 64, 128), seed=0,
+                  target_recall=None):
+    """Measure recall@k and latency of the index against brute-force search.
+
+    Query stories are sampled from the store itself and excluded from their
+    own results, like a :k search in the TUI.
+
+    Args:
+        n_probes: Values of n_probe to measure, in increasing order
+        target_recall: If set, stop after the first n_probe that reaches it
+
+    Returns:
+        List of dicts {'n_probe', 'recall', 'ann_ms', 'exact_ms'}, one per n_probe
+    """
+    ids = store.snapshot()[0]
+    rng = np.random.default_rng(seed)
+    query_rows = rng.choice(len(ids), size=min(n_queries, len(ids)), replace=False)
+    queries = [(int(ids[row]), store.get(int(ids[row]))) for row in query_rows]
+
+    start = time.perf_counter()
+    exact = [set(sid for sid, _ in store.find_k_most_similar(vec, k, exclude_query_id=qid)) for qid, vec in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+    report = []
+    for n_probe in n_probes:
+        if n_probe > index.n_lists:
+            break
+        start = time.perf_counter()
+        approx = [index.find_k_most_similar(store, vec, k, exclude_query_id=qid, n_probe=n_probe) for qid, vec in queries]
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+        hits = sum(len(truth & set(sid for sid, _ in found)) for truth, found in zip(exact, approx))
+        total = sum(len(truth) for truth in exact)
+        report.append({
+            'n_probe': n_probe,
+            'recall': hits / total if total else 1.0,
+            'ann_ms': ann_ms,
+            'exact_ms': exact_ms,
+        })
+        if target_recall is not None and report[-1]['recall'] >= target_recall:
+            break
+    return report
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from database import db_config_from_env
+    from embedding_cache import EmbeddingCache
+    from similarity import EmbeddingStore
+
+    parser = argparse.ArgumentParser(description='IVF index recall report for the local embedding cache')
+    parser.add_argument('--sqlite', action='store_true', help='Use the cache of the SQLite database instead of PostgreSQL')
+    parser.add_argument('--lists', type=int, default=None, help='Number of IVF lists (default: 4 * sqrt(rows))')
+    parser.add_argument('--probes', default='1,2,4,8,16,32,64,128,256',
+                        help='Comma-separated n_probe values to measure (default: %(default)s)')
+    parser.add_argument('--target-recall', type=float, default=DEFAULT_TARGET_RECALL,
+                        help='Recall the tuned n_probe must reach (default: %(default)s)')
+    parser.add_argument('--queries', type=int, default=200, help='Number of sampled query stories')
+    parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+    args = parser.parse_args()
+
+    load_dotenv()
+    db_config = db_config_from_env(args.sqlite)
+    if db_config is None:
+        print("Error: POSTGRES_DB and POSTGRES_USER must be set in .env file for PostgreSQL mode")
+        raise SystemExit(1)
+    cache = EmbeddingCache.for_source(db_config)
+    store = EmbeddingStore()
+    if not cache.load_into(store):
+        print(f"No cached embeddings in {cache.cache_dir}; open the TUI once to fill the cache.")
+        raise SystemExit(1)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(store, n_lists=args.lists, target_recall=args.target_recall)
+    print(f"Built IVF index: {len(store)} rows, {index.n_lists} lists in {time.perf_counter() - start:.1f}s; "
+          f"tuned n_probe {index.n_probe} (recall@10 >= {args.target_recall} on sampled stories)")
+    print(f"{'n_probe':>8} {'recall@' + str(args.k):>10} {'ann ms':>9} {'exact ms':>9}")
+    n_probes = sorted(int(p) for p in args.probes.split(',') if p.strip())
+    for row in recall_report(store, index, n_queries=args.queries, k=args.k, n_probes=n_probes):
+        print(f"{row['n_probe']:>8} {row['recall']:>10.3f} {row['ann_ms']:>9.2f} {row['exact_ms']:>9.2f}")
@@ -0,0 +1,259 @@
+# async_database.py
+# Async versions of the database.py read functions, run on one background event loop
+#
+# The TUI's curses loop stays synchronous: it hands coroutines to the loop with
+# run() (wait for the result) or submit() (fire and forget, e.g. prefetching and
+# embedding loads), so several queries can be in flight while keys are handled.
+# SQLite goes through aiosqlite; PostgreSQL calls the pooled psycopg2 functions
+# in database.py on worker threads.
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import aiosqlite
+
+import database
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+_sqlite_connections = {}  # db_path -> aiosqlite connection, used only on the loop
+
+
+def _get_loop():
+    """Return the background event loop, starting its thread on first use."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="db-event-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def submit(coro):
+    """Schedule a coroutine on the background loop.
+
+    Returns:
+        concurrent.futures.Future; cancel() on it cancels the coroutine
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop())
+
+
+def run(coro, timeout=None):
+    """Run a coroutine on the background loop and wait for its result."""
+    return submit(coro).result(timeout)
+
+
+def close_async_database():
+    """Close the aiosqlite connections and stop the background loop (call on program exit)."""
+    global _loop, _loop_thread
+    with _loop_lock:
+        loop, thread = _loop, _loop_thread
+        _loop = _loop_thread = None
+    if loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(5)
+    except Exception:
+        pass
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(5)
+
+
+async def _shutdown():
+    """Cancel background jobs still running (prefetches, embedding loads), then close connections."""
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    connections = list(_sqlite_connections.values())
+    _sqlite_connections.clear()
+    for conn in connections:
+        await conn.close()
+
+
+async def _sqlite_connection(db_path):
+    """The loop's aiosqlite connection to db_path, opened and tuned on first use."""
+    conn = _sqlite_connections.get(db_path)
+    if conn is None:
+        conn = await aiosqlite.connect(db_path)
+        for pragma in database.SQLITE_PRAGMAS:
+            try:
+                await conn.execute(pragma)
+            except aiosqlite.DatabaseError:
+                pass
+        _sqlite_connections[db_path] = conn
+    return conn
+
+
+async def _sqlite_fetchall(db_path, query, params=()):
+    conn = await _sqlite_connection(db_path)
+    async with conn.execute(query, params) as cursor:
+        return await cursor.fetchall()
+
+
+def _story_dict(row):
+    return {
+        'id': row[0],
+        'title': row[1],
+        'author': row[2],
+        'issue_date': row[3],
+        'content': row[4]
+    }
+
+
+async def fetch_all_dates(db_config, use_sqlite=True):
+    """Async fetch_all_dates: list of date strings in YYYYMMDD format, newest first."""
+    if not use_sqlite:
+        return await asyncio.to_thread(database.fetch_all_dates, db_config, use_sqlite)
+    rows = await _sqlite_fetchall(db_config, "SELECT DISTINCT issue_date FROM stories ORDER BY issue_date DESC")
+    return [str(row[0]) for row in rows]
+
+
+async def fetch_date_counts(db_config, use_sqlite=True, min_id=None):
+    """Async fetch_date_counts: ({date string: story count}, max story id)."""
+    return await asyncio.to_thread(database.fetch_date_counts, db_config, use_sqlite, min_id)
+
+
+async def fetch_story_titles(db_config, date_str, use_sqlite=True):
+    """Async fetch_story_titles: list of (story_id, title) tuples for a date."""
+    if not use_sqlite:
+        return await asyncio.to_thread(database.fetch_story_titles, db_config, date_str, use_sqlite)
+    rows = await _sqlite_fetchall(db_config, "SELECT id, title FROM stories WHERE issue_date=? ORDER BY id", (date_str,))
+    return [(r[0], r[1]) for r in rows]
+
+
+async def fetch_story_titles_page(db_config, date_str, after_id=None, limit=database.PAGE_SIZE, use_sqlite=True):
+    """Async fetch_story_titles_page: one keyset page of (story_id, title) tuples, in id order."""
+    if not use_sqlite:
+        return await asyncio.to_thread(database.fetch_story_titles_page, db_config, date_str, after_id, limit, use_sqlite)
+    if after_id is None:
+        rows = await _sqlite_fetchall(
+            db_config, "SELECT id, title FROM stories WHERE issue_date=? ORDER BY id LIMIT ?", (date_str, limit)
+        )
+    else:
+        rows = await _sqlite_fetchall(
+            db_config, "SELECT id, title FROM stories WHERE issue_date=? AND id > ? ORDER BY id LIMIT ?",
+            (date_str, after_id, limit)
+        )
+    return [(r[0], r[1]) for r in rows]
+
+
+async def count_story_titles(db_config, date_str, use_sqlite=True):
+    """Async count_story_titles: number of stories for a date."""
+    if not use_sqlite:
+        return await asyncio.to_thread(database.count_story_titles, db_config, date_str, use_sqlite)
+    rows = await _sqlite_fetchall(db_config, "SELECT COUNT(*) FROM stories WHERE issue_date=?", (date_str,))
+    return rows[0][0]
+
+
+async def fetch_story_content(db_config, story_id, use_sqlite=True):
+    """Async fetch_story_content: story dict, or None if not found."""
+    if not use_sqlite:
+        return await asyncio.to_thread(database.fetch_story_content, db_config, story_id, use_sqlite)
+    rows = await _sqlite_fetchall(
+        db_config, "SELECT id, title, author, issue_date, content FROM stories WHERE id=?", (story_id,)
+    )
+    return _story_dict(rows[0]) if rows else None
+
+
+async def fetch_story_contents(db_config, story_ids, use_sqlite=True, chunk_size=500):
+    """Async fetch_story_contents: {story_id: story dict} for the ids that exist."""
+    if not use_sqlite:
+        return await asyncio.to_thread(database.fetch_story_contents, db_config, story_ids, use_sqlite, chunk_size)
+    story_ids = list(dict.fromkeys(story_ids))
+    stories = {}
+    for start in range(0, len(story_ids), chunk_size):
+        chunk = story_ids[start:start + chunk_size]
+        placeholders = ",".join("?" * len(chunk))
+        rows = await _sqlite_fetchall(
+            db_config, f"SELECT id, title, author, issue_date, content FROM stories WHERE id IN ({placeholders})", chunk
+        )
+        stories.update((row[0], _story_dict(row)) for row in rows)
+    return stories
+
+
+async def fetch_titles_by_ids(db_config, story_ids, use_sqlite=True, chunk_size=500):
+    """Async fetch_titles_by_ids: {story_id: title} for the ids that exist."""
+    if not use_sqlite:
+        return await asyncio.to_thread(database.fetch_titles_by_ids, db_config, story_ids, use_sqlite, chunk_size)
+    story_ids = list(dict.fromkeys(story_ids))
+    titles = {}
+    for start in range(0, len(story_ids), chunk_size):
+        chunk = story_ids[start:start + chunk_size]
+        placeholders = ",".join("?" * len(chunk))
+        titles.update(await _sqlite_fetchall(db_config, f"SELECT id, title FROM stories WHERE id IN ({placeholders})", chunk))
+    return titles
+
+
+async def fetch_story_embedding(db_config, story_id, use_sqlite=True):
+    """Async fetch_story_embedding: float32 array, or None."""
+    return await asyncio.to_thread(database.fetch_story_embedding, db_config, story_id, use_sqlite)
+
+
+async def search_stories(db_config, query, limit=200, use_sqlite=True, date_range=None):
+    """Async search_stories (FTS5 / tsvector full-text search) on a worker thread."""
+    return await asyncio.to_thread(database.search_stories, db_config, query, limit, use_sqlite, date_range)
+
+
+async def fetch_story_ids_in_date_range(db_config, date_range, use_sqlite=True):
+    """Async fetch_story_ids_in_date_range: story ids issued within (start, end)."""
+    return await asyncio.to_thread(database.fetch_story_ids_in_date_range, db_config, date_range, use_sqlite)
+
+
+async def fetch_similar_stories(db_config, story_id, k=5, date_range=None, use_sqlite=False):
+    """Async fetch_similar_stories (pgvector / sqlite-vec KNN) on a worker thread."""
+    return await asyncio.to_thread(database.fetch_similar_stories, db_config, story_id, k, date_range, use_sqlite)
+
+
+async def fetch_neighbors_state(db_config, use_sqlite=True):
+    """Async fetch_neighbors_state: (top_n, max_story_id) of story_neighbors, or None."""
+    return await asyncio.to_thread(database.fetch_neighbors_state, db_config, use_sqlite)
+
+
+async def fetch_precomputed_neighbors(db_config, story_id, k=5, use_sqlite=True):
+    """Async fetch_precomputed_neighbors: [(story_id, title, score), ...] from story_neighbors."""
+    return await asyncio.to_thread(database.fetch_precomputed_neighbors, db_config, story_id, k, use_sqlite)
+
+
+async def has_sqlite_vectors(db_path):
+    """Async has_sqlite_vectors: whether sqlite-vec KNN can be used."""
+    return await asyncio.to_thread(database.has_sqlite_vectors, db_path)
+
+
+async def stream_story_embeddings(db_config, use_sqlite=True, min_id=None, itersize=2000, progress=None):
+    """Async generator over database.stream_story_embeddings batches.
+
+    The generator is driven from one dedicated thread for its whole life:
+    its connection (a per-thread SQLite connection, or a pooled PostgreSQL
+    one) is only ever used from that thread, and the loop keeps serving
+    other queries while a batch is read and decoded. progress is called
+    from that thread.
+
+    Yields:
+        Tuples (story_ids, vectors) as in database.stream_story_embeddings
+    """
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-stream")
+    batches = database.stream_story_embeddings(db_config, use_sqlite, min_id, itersize, progress)
+    try:
+        while True:
+            batch = await loop.run_in_executor(executor, next, batches, None)
+            if batch is None:
+                return
+            yield batch
+    finally:
+        # Queued behind any batch still being read, so this returns the
+        # connection even when the consumer stops early or is cancelled
+        closing = loop.run_in_executor(executor, batches.close)
+        executor.shutdown(wait=False)
+        await asyncio.shield(closing)
+
+
+async def fetch_all_story_embeddings(db_config, use_sqlite=True, min_id=None):
+    """Async fetch_all_story_embeddings: {story_id: float32 array}."""
+    embeddings = {}
+    async for story_ids, vectors in stream_story_embeddings(db_config, use_sqlite, min_id):
+        embeddings.update(zip(story_ids.tolist(), vectors))
+    return embeddings
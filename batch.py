@@ -0,0 +1,322 @@
+# batch.py
+# Headless batch jobs: index creation, bulk KNN, the story_neighbors precompute, and story export as JSONL or CSV
+#
+# Reached through `python main.py batch ...` for nightly jobs. Nothing here
+# imports curses; results are streamed to the output as they are computed.
+
+import sys
+import csv
+import json
+import time
+import argparse
+
+import database
+from database import db_config_from_env, close_db_connection
+from similarity import EmbeddingStore, BATCH_MEMORY_BYTES
+from embedding_cache import EmbeddingCache
+from parallel_knn import ParallelKNN
+from neighbors import DEFAULT_TOP_N, refresh_story_neighbors
+
+TITLE_BLOCK = 256  # queries whose titles are looked up in one query
+
+KNN_CSV_FIELDS = ['query_id', 'query_title', 'rank', 'story_id', 'title', 'score']
+EXPORT_FIELDS = ['id', 'title', 'author', 'issue_date', 'content']
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def load_embeddings(db_config, use_sqlite=True, rebuild_cache=False):
+    """EmbeddingStore with every story embedding.
+
+    Same path as the TUI's background load: the on-disk embedding cache is
+    memory-mapped, then only stories newer than its max id are streamed
+    from the database and appended to it.
+    """
+    cache = EmbeddingCache.for_source(db_config)
+    if rebuild_cache:
+        cache.clear()
+    store = EmbeddingStore()
+    cache.load_into(store)
+    use_cache = True
+    for batch_ids, batch_vectors in database.stream_story_embeddings(db_config, use_sqlite, min_id=cache.max_id):
+        if use_cache:
+            try:
+                cache.write(batch_ids, batch_vectors)
+                cache.load_into(store, appended=True)
+                continue
+            except OSError:
+                # Cache directory not writable: keep new rows in memory only
+                use_cache = False
+        store.add(batch_ids, batch_vectors)
+    return store
+
+
+def iter_date_story_ids(db_config, date_str, use_sqlite=True):
+    """Story ids of a date in id order, read in keyset pages."""
+    after_id = None
+    while True:
+        page = database.fetch_story_titles_page(db_config, date_str, after_id, database.PAGE_SIZE, use_sqlite)
+        for story_id, _ in page:
+            yield story_id
+        if len(page) < database.PAGE_SIZE:
+            return
+        after_id = page[-1][0]
+
+
+def knn_records(db_config, store, query_ids, k=10, candidate_ids=None, use_sqlite=True,
+                memory_bytes=BATCH_MEMORY_BYTES):
+    """Top-k neighbours of each query story, as output records.
+
+    store is an EmbeddingStore, or a ParallelKNN to spread the scoring over workers.
+
+    Yields:
+        {'story_id', 'title', 'neighbors': [{'story_id', 'title', 'score'}, ...]}
+        per query story that has an embedding
+    """
+    block = []
+
+    def flush():
+        wanted = {sid for qid, neighbours in block for sid in [qid] + [n for n, _ in neighbours]}
+        titles = database.fetch_titles_by_ids(db_config, list(wanted), use_sqlite)
+        for qid, neighbours in block:
+            yield {
+                'story_id': qid,
+                'title': titles.get(qid),
+                'neighbors': [
+                    {'story_id': sid, 'title': titles.get(sid), 'score': round(score, 6)}
+                    for sid, score in neighbours
+                ],
+            }
+        block.clear()
+
+    for result in store.batch_k_most_similar(query_ids, k, candidate_ids, memory_bytes):
+        block.append(result)
+        if len(block) >= TITLE_BLOCK:
+            yield from flush()
+    if block:
+        yield from flush()
+
+
+def knn_csv_rows(records):
+    """Flatten knn_records into one CSV row per (query, neighbour)."""
+    for record in records:
+        for rank, neighbour in enumerate(record['neighbors'], start=1):
+            yield {
+                'query_id': record['story_id'],
+                'query_title': record['title'],
+                'rank': rank,
+                'story_id': neighbour['story_id'],
+                'title': neighbour['title'],
+                'score': neighbour['score'],
+            }
+
+
+def export_records(db_config, dates, use_sqlite=True, with_content=True):
+    """Stories of the given dates, a page at a time.
+
+    Yields:
+        Story dicts ({'id', 'title', 'author', 'issue_date', 'content'}) in id order per date
+    """
+    for date_str in dates:
+        after_id = None
+        while True:
+            page = database.fetch_story_titles_page(db_config, date_str, after_id, database.PAGE_SIZE, use_sqlite)
+            if not page:
+                break
+            if with_content:
+                stories = database.fetch_story_contents(db_config, [sid for sid, _ in page], use_sqlite)
+                for story_id, _ in page:
+                    if story_id in stories:
+                        yield stories[story_id]
+            else:
+                for story_id, title in page:
+                    yield {'id': story_id, 'title': title, 'issue_date': date_str}
+            if len(page) < database.PAGE_SIZE:
+                break
+            after_id = page[-1][0]
+
+
+def write_records(records, out, fmt, fieldnames=None):
+    """Write dict records to out as JSON lines or CSV; returns the number written."""
+    written = 0
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=fieldnames, extrasaction='ignore')
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            written += 1
+    else:
+        for record in records:
+            out.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            written += 1
+    return written
+
+
+def add_knn_engine_arguments(parser):
+    """Options shared by the jobs that score stories against every embedding."""
+    parser.add_argument('--memory-mb', type=float, default=BATCH_MEMORY_BYTES / (1024 * 1024),
+                        help='Memory for the score matrix of one chunk of queries (default: %(default).0f)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Score shards of the embeddings in parallel on this many workers '
+                             '(0: one per CPU; default: 1, no workers)')
+    parser.add_argument('--backend', choices=['processes', 'threads'], default='processes',
+                        help='Workers are processes sharing the embeddings through shared memory, '
+                             'or threads in this process (default: processes)')
+    parser.add_argument('--rebuild-embedding-cache', action='store_true',
+                        help='Discard the local embedding cache and reload every embedding from the database')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='main.py batch',
+        description='Headless batch jobs (no terminal needed); results go to stdout or --output'
+    )
+    parser.add_argument('--sqlite', action='store_true', help='Use SQLite database instead of PostgreSQL')
+    parser.add_argument('--format', choices=['jsonl', 'csv'], default='jsonl', help='Output format (default: jsonl)')
+    parser.add_argument('-o', '--output', help='Output file (default: stdout)')
+    jobs = parser.add_subparsers(dest='job', required=True)
+
+    jobs.add_parser('index', help='Create the full-text index that :s and :h search, and the vector index for :k '
+                                  '(pgvector for --knn server; with --sqlite, the sqlite-vec table, which later '
+                                  'runs bring up to date). Slow the first time on a large archive.')
+
+    knn = jobs.add_parser('knn', help='Top-k related stories for every story of some dates, or for given ids')
+    knn.add_argument('--date', action='append', default=[], metavar='YYYYMMDD',
+                     help='Query every story of this date (repeatable)')
+    knn.add_argument('--ids', default='', help='Comma-separated query story ids')
+    knn.add_argument('-k', type=int, default=10, help='Neighbours per story (default: 10)')
+    knn.add_argument('--within', nargs=2, metavar=('START', 'END'),
+                     help='Only consider neighbours issued between these dates (YYYYMMDD, inclusive)')
+    add_knn_engine_arguments(knn)
+
+    neighbors = jobs.add_parser('neighbors', help='Precompute the related stories of every story into the '
+                                                  'story_neighbors table (only new stories after the first run)')
+    neighbors.add_argument('--top-n', type=int, default=DEFAULT_TOP_N,
+                           help='Neighbours stored per story; :k in the reader uses the table for k up to this '
+                                '(default: %(default)d)')
+    neighbors.add_argument('--rebuild', action='store_true', help='Recompute every story instead of only new ones')
+    add_knn_engine_arguments(neighbors)
+
+    export = jobs.add_parser('export', help="Export the stories of some dates")
+    export.add_argument('dates', nargs='+', metavar='YYYYMMDD', help='Dates to export')
+    export.add_argument('--titles-only', action='store_true', help='Leave out author and content')
+    return parser
+
+
+def run_index(args, db_config, out):
+    if database.search_index_exists(db_config, args.sqlite):
+        log("batch index: full-text index already exists")
+    else:
+        started = time.monotonic()
+        log("batch index: creating the full-text index...")
+        database.ensure_search_index(db_config, args.sqlite)
+        log(f"batch index: full-text index created in {time.monotonic() - started:.1f}s")
+    if args.sqlite:
+        error = database.sqlite_vec_error(db_config)
+        if error is not None:
+            log(f"batch index: no sqlite-vec table ({error}); :k will load embeddings into the reader instead")
+            return 0
+        started = time.monotonic()
+        log("batch index: copying new embeddings into the sqlite-vec table...")
+        added = database.sync_sqlite_vectors(db_config)
+        if added is None:
+            log("batch index: stories has no story_embedding column; no vector table")
+        else:
+            log(f"batch index: {added} vectors added in {time.monotonic() - started:.1f}s")
+    else:
+        started = time.monotonic()
+        log("batch index: creating the pgvector index (if missing)...")
+        if database.ensure_vector_index(db_config, args.sqlite):
+            log(f"batch index: pgvector index ready after {time.monotonic() - started:.1f}s")
+        else:
+            log("batch index: story_embedding is not a pgvector column; no vector index")
+    return 0
+
+
+def run_knn(args, db_config, out):
+    query_ids = [int(sid) for sid in args.ids.split(',') if sid.strip()]
+    for date_str in args.date:
+        query_ids.extend(iter_date_story_ids(db_config, date_str, args.sqlite))
+    if not query_ids:
+        log("batch knn: give query stories with --date and/or --ids")
+        return 2
+    started = time.monotonic()
+    store = load_embeddings(db_config, args.sqlite, args.rebuild_embedding_cache)
+    log(f"batch knn: {len(store)} embeddings loaded in {time.monotonic() - started:.1f}s")
+    candidate_ids = None
+    if args.within:
+        candidate_ids = database.fetch_story_ids_in_date_range(db_config, tuple(args.within), args.sqlite)
+    engine = None
+    if args.workers != 1:
+        engine = ParallelKNN(store, args.workers or None, args.backend)
+        log(f"batch knn: {engine.workers} {args.backend} workers")
+    try:
+        records = knn_records(db_config, engine or store, query_ids, args.k, candidate_ids, args.sqlite,
+                              int(args.memory_mb * 1024 * 1024))
+        if args.format == 'csv':
+            records = knn_csv_rows(records)
+        written = write_records(records, out, args.format, KNN_CSV_FIELDS)
+    finally:
+        if engine is not None:
+            engine.close()
+    log(f"batch knn: {written} rows for {len(query_ids)} query stories in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+def run_neighbors(args, db_config, out):
+    if args.top_n <= 0:
+        log("batch neighbors: --top-n must be positive")
+        return 2
+    started = time.monotonic()
+    store = load_embeddings(db_config, args.sqlite, args.rebuild_embedding_cache)
+    log(f"batch neighbors: {len(store)} embeddings loaded in {time.monotonic() - started:.1f}s")
+    engine = None
+    if args.workers != 1:
+        engine = ParallelKNN(store, args.workers or None, args.backend)
+        log(f"batch neighbors: {engine.workers} {args.backend} workers")
+    try:
+        new, updated = refresh_story_neighbors(db_config, store, args.top_n, args.sqlite, engine, args.rebuild,
+                                               int(args.memory_mb * 1024 * 1024), log)
+    finally:
+        if engine is not None:
+            engine.close()
+    log(f"batch neighbors: {new} new and {updated} updated lists in {time.monotonic() - started:.1f}s")
+    return 0
+
+
+def run_export(args, db_config, out):
+    records = export_records(db_config, args.dates, args.sqlite, not args.titles_only)
+    fields = ['id', 'title', 'issue_date'] if args.titles_only else EXPORT_FIELDS
+    written = write_records(records, out, args.format, fields)
+    log(f"batch export: {written} stories")
+    return 0
+
+
+def main(argv):
+    """Entry point for `main.py batch` (call load_dotenv() first).
+
+    Returns:
+        Process exit code
+    """
+    args = build_parser().parse_args(argv)
+    db_config = db_config_from_env(args.sqlite)
+    if db_config is None:
+        log("Error: POSTGRES_DB and POSTGRES_USER must be set in .env file for PostgreSQL mode")
+        return 1
+    out = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        if args.job == 'index':
+            return run_index(args, db_config, out)
+        if args.job == 'knn':
+            return run_knn(args, db_config, out)
+        if args.job == 'neighbors':
+            return run_neighbors(args, db_config, out)
+        return run_export(args, db_config, out)
+    except BrokenPipeError:
+        return 0  # e.g. piped into head
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        close_db_connection()
@@ -0,0 +1,120 @@
+# bench_embedding_decode.py
+# Benchmark for loading embeddings: per-row text parsing vs binary COPY
+#
+# Usage:
+#   python bench_embedding_decode.py                 # synthetic data, no database
+#   python bench_embedding_decode.py --rows 50000
+#   python bench_embedding_decode.py --live          # against the PostgreSQL in .env
+
+import time
+import json
+import struct
+import argparse
+import numpy as np
+from dotenv import load_dotenv
+
+from database import (
+    _COPY_SIGNATURE,
+    _decode_embedding,
+    db_config_from_env,
+    decode_binary_copy,
+    close_db_connection,
+    stream_story_embeddings,
+)
+
+
+def _timed(label, func, rows):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<44} {elapsed:8.3f}s  {rows / elapsed:12,.0f} rows/s")
+    return result
+
+
+def _make_binary_copy(ids, vectors):
+    """Encode (id, real[]) rows the way COPY ... (FORMAT binary) sends them."""
+    dim = vectors.shape[1]
+    parts = [_COPY_SIGNATURE, struct.pack(">ii", 0, 0)]
+    array_header = struct.pack(">iiiii", 1, 0, 700, dim, 1)  # ndim, has_null, float4 oid, dim, lbound
+    elems = np.empty(dim, dtype=[('len', '>i4'), ('value', '>f4')])
+    elems['len'] = 4
+    for story_id, vector in zip(ids.tolist(), vectors):
+        elems['value'] = vector
+        array = array_header + elems.tobytes()
+        parts.append(struct.pack(">hiii", 2, 4, story_id, len(array)))
+        parts.append(array)
+    parts.append(struct.pack(">h", -1))
+    return b"".join(parts)
+
+
+def _legacy_decode(rows):
+    """The pre-binary loader: one Python list per row, then a matrix."""
+    embeddings = {}
+    for story_id, embedding in rows:
+        if isinstance(embedding, list):
+            embeddings[story_id] = embedding
+        elif isinstance(embedding, str):
+            embeddings[story_id] = json.loads(embedding)
+        else:
+            embeddings[story_id] = list(embedding)
+    return np.asarray(list(embeddings.values()), dtype=np.float32)
+
+
+def _text_decode(rows):
+    matrix = np.empty((len(rows), len(_decode_embedding(rows[0][1]))), dtype=np.float32)
+    for i, (_, embedding) in enumerate(rows):
+        matrix[i] = _decode_embedding(embedding)
+    return matrix
+
+
+def run_synthetic(n_rows, dim):
+    rng = np.random.default_rng(0)
+    ids = np.arange(1, n_rows + 1, dtype=np.int64)
+    vectors = rng.standard_normal((n_rows, dim)).astype(np.float32)
+    print(f"Synthetic: {n_rows} rows x {dim} dims")
+
+    list_rows = [(sid, vec) for sid, vec in zip(ids.tolist(), vectors.tolist())]
+    text_rows = [(sid, "[" + ",".join(map(repr, vec)) + "]") for sid, vec in list_rows]
+    binary = _make_binary_copy(ids, vectors)
+
+    _timed("legacy: float[] lists -> dict -> matrix", lambda: _legacy_decode(list_rows), n_rows)
+    _timed("legacy: pgvector text json.loads -> matrix", lambda: _legacy_decode(text_rows), n_rows)
+    _timed("text: np.fromstring per row", lambda: _text_decode(text_rows), n_rows)
+    _, decoded, _ = _timed("binary: decode_binary_copy", lambda: decode_binary_copy(binary), n_rows)
+    assert np.array_equal(decoded, vectors)
+
+
+def run_live(db_config, itersize):
+    def consume(binary):
+        count = 0
+        for story_ids, _ in stream_story_embeddings(db_config, False, itersize=itersize, binary=binary):
+            count += len(story_ids)
+        return count
+
+    # Warm the connection and the server's buffer cache first
+    rows = consume(True)
+    print(f"Live: {rows} embeddings, itersize {itersize}")
+    _timed("stream_story_embeddings(binary=False)", lambda: consume(False), rows)
+    _timed("stream_story_embeddings(binary=True)", lambda: consume(True), rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark embedding decoding')
+    parser.add_argument('--rows', type=int, default=20000, help='Synthetic row count')
+    parser.add_argument('--dim', type=int, default=768, help='Synthetic embedding dimension')
+    parser.add_argument('--live', action='store_true', help='Benchmark against the PostgreSQL database in .env')
+    parser.add_argument('--itersize', type=int, default=2000, help='Rows per round trip in --live mode')
+    args = parser.parse_args()
+
+    if args.live:
+        load_dotenv()
+        db_config = db_config_from_env(use_sqlite=False)
+        if db_config is None:
+            print("Error: POSTGRES_DB and POSTGRES_USER must be set in .env file for PostgreSQL mode")
+        else:
+            try:
+                run_live(db_config, args.itersize)
+            finally:
+                close_db_connection()
+    else:
+        run_synthetic(args.rows, args.dim)
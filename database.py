@@ -2,57 +2,200 @@
 
 import sqlite3
 import psycopg2
+import psycopg2.pool
+import psycopg2.extras
+import io
+import os
+import re
 import datetime
+import functools
+import threading
+from contextlib import contextmanager
+import numpy as np
 
-# Connection caching for PostgreSQL (connection reuse)
-_db_connection = None
-_db_config = None
-_use_sqlite = None
+# PostgreSQL connection pool, created on first use and shared by all threads
+POSTGRES_POOL_SIZE = int(os.getenv("POSTGRES_POOL_SIZE", "8"))
+_pg_pool = None
+_pg_pool_key = None
+_pg_pool_lock = threading.Lock()
+# psycopg2 pools raise PoolError when exhausted; this makes callers wait instead
+_pg_slots = threading.BoundedSemaphore(POSTGRES_POOL_SIZE)
 
-def _get_connection(use_sqlite, db_config):
-    """Get a database connection (cached for PostgreSQL, new for SQLite).
+# SQLite: one reusable connection per (thread, database file)
+_sqlite_local = threading.local()
+_sqlite_connections = []  # every connection opened, so close_db_connection can reach them all
+_sqlite_connections_lock = threading.Lock()
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",      # readers never block on the background writers
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",     # 64 MB page cache
+    "PRAGMA mmap_size=268435456",   # 256 MB memory-mapped I/O
+)
+
+# Rows per keyset page of a date's titles (the TUI's TitlePages and batch jobs)
+PAGE_SIZE = 500
+
+def db_config_from_env(use_sqlite):
+    """Build db_config from environment variables (call load_dotenv() first).
     
     Args:
         use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
-        db_config: If use_sqlite is True, this is the SQLite database file path.
-                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
     
     Returns:
-        Database connection object
+        The SQLite database file path (STORY_DB_DIR, default news.db), or a dict
+        with PostgreSQL connection params read from the POSTGRES_* variables.
+        Returns None if POSTGRES_DB or POSTGRES_USER is missing in PostgreSQL mode.
+    """
+    if use_sqlite:
+        # SQLite mode: use STORY_DB_DIR or default to news.db
+        return os.getenv("STORY_DB_DIR", "news.db")
+    
+    # PostgreSQL mode: read connection parameters from .env
+    db_config = {
+        'host': os.getenv("POSTGRES_HOST") or "localhost",
+        'port': os.getenv("POSTGRES_PORT") or "5432",
+        'database': os.getenv("POSTGRES_DB"),
+        'user': os.getenv("POSTGRES_USER"),
+    }
+    # Only include the password if it is set
+    password = os.getenv("POSTGRES_PASSWORD")
+    if password:
+        db_config['password'] = password
+    
+    # Validate required PostgreSQL parameters
+    if not db_config['database'] or not db_config['user']:
+        return None
+    return db_config
+
+def _get_pool(db_config):
+    """Return the PostgreSQL pool for db_config, replacing it if the config changed."""
+    global _pg_pool, _pg_pool_key
+    config_key = str(sorted(db_config.items()))
+    with _pg_pool_lock:
+        if _pg_pool is None or _pg_pool_key != config_key:
+            if _pg_pool is not None:
+                _pg_pool.closeall()
+            _pg_pool = psycopg2.pool.ThreadedConnectionPool(1, POSTGRES_POOL_SIZE, **db_config)
+            _pg_pool_key = config_key
+        return _pg_pool
+
+def _sqlite_connection(db_path, with_vec=False):
+    """Return this thread's connection to db_path, opening and tuning it on first use.
+    
+    Args:
+        db_path: SQLite database file path
+        with_vec: If True, return None unless the sqlite-vec extension is loaded
     """
-    global _db_connection, _db_config, _use_sqlite
+    connections = getattr(_sqlite_local, "connections", None)
+    if connections is None:
+        connections = _sqlite_local.connections = {}
+    entry = connections.get(db_path)
+    if entry is None:
+        # check_same_thread=False only so close_db_connection can close it;
+        # the connection itself is never shared between threads
+        conn = sqlite3.connect(db_path, check_same_thread=False)
+        for pragma in SQLITE_PRAGMAS:
+            try:
+                conn.execute(pragma)
+            except sqlite3.DatabaseError:
+                pass  # e.g. WAL on a read-only file
+        entry = connections[db_path] = (conn, _load_sqlite_vec(conn))
+        with _sqlite_connections_lock:
+            _sqlite_connections.append(conn)
+    conn, vec_error = entry
+    if with_vec and vec_error is not None:
+        return None
+    return conn
+
+@contextmanager
+def _connection(use_sqlite, db_config):
+    """Borrow a database connection for the duration of a with-block.
     
+    SQLite connections are per-thread and stay open. PostgreSQL connections
+    come from a thread-safe pool; the read transaction is rolled back when
+    the block ends, and a connection that was dropped by the server is
+    discarded instead of going back to the pool (see _retry_on_disconnect).
+    
+    Args:
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+    """
     if use_sqlite:
-        # SQLite: create new connection each time (cheap, file-based)
-        return sqlite3.connect(db_config)
-    else:
-        # PostgreSQL: reuse connection to avoid overhead
-        config_key = str(sorted(db_config.items()))
-        if _db_connection is None or _db_config != config_key or _use_sqlite != use_sqlite:
-            if _db_connection:
+        yield _sqlite_connection(db_config)
+        return
+    
+    with _pg_slots:
+        pool = _get_pool(db_config)
+        conn = pool.getconn()
+        try:
+            yield conn
+        except BaseException as e:
+            if conn.closed:
+                pool.putconn(conn, close=True)
+                if isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError)):
+                    raise _ConnectionDropped(str(e)) from e
+            else:
                 try:
-                    _db_connection.close()
-                except:
-                    pass
-            _db_connection = psycopg2.connect(**db_config)
-            _db_config = config_key
-            _use_sqlite = use_sqlite
-        return _db_connection
+                    conn.rollback()
+                    pool.putconn(conn)
+                except psycopg2.Error:
+                    pool.putconn(conn, close=True)
+            raise
+        else:
+            try:
+                conn.rollback()  # end the read transaction
+                pool.putconn(conn)
+            except psycopg2.Error:
+                pool.putconn(conn, close=True)
+
+class _ConnectionDropped(psycopg2.OperationalError):
+    """A pooled PostgreSQL connection turned out to be closed by the server."""
+
+def _retry_on_disconnect(func):
+    """Retry a query function when PostgreSQL dropped the pooled connection.
+    
+    Each failed attempt discards its dead connection, so after at most
+    POSTGRES_POOL_SIZE retries the pool has to open a fresh one. Other
+    errors (including failing to connect at all) are not retried.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(POSTGRES_POOL_SIZE + 1):
+            try:
+                return func(*args, **kwargs)
+            except _ConnectionDropped:
+                if attempt == POSTGRES_POOL_SIZE:
+                    raise
+    return wrapper
 
 def close_db_connection():
-    """Close cached database connection (call on program exit)."""
-    global _db_connection, _db_config, _use_sqlite
-    if _db_connection:
-        try:
-            _db_connection.close()
-        except:
-            pass
-        _db_connection = None
-        _db_config = None
-        _use_sqlite = None
+    """Close pooled and per-thread database connections (call on program exit)."""
+    global _pg_pool, _pg_pool_key
+    with _pg_pool_lock:
+        if _pg_pool is not None:
+            try:
+                _pg_pool.closeall()
+            except psycopg2.Error:
+                pass
+            _pg_pool = None
+            _pg_pool_key = None
+    with _sqlite_connections_lock:
+        for conn in _sqlite_connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _sqlite_connections.clear()
+    _sqlite_local.connections = {}
 
+@_retry_on_disconnect
 def fetch_all_dates(db_config, use_sqlite=True):
-    """Fetch all distinct dates from the database.
+    """Fetch all distinct issue dates that have stories.
+    
+    Dates come from the stories table, like fetch_date_counts, so every
+    listed date opens to its stories.
     
     Args:
         db_config: If use_sqlite is True, this is the SQLite database file path.
@@ -62,29 +205,59 @@ def fetch_all_dates(db_config, use_sqlite=True):
     Returns:
         List of date strings in YYYYMMDD format
     """
-    conn = _get_connection(use_sqlite, db_config)
-    try:
+    with _connection(use_sqlite, db_config) as conn:
         c = conn.cursor()
-        query = "SELECT DISTINCT issue_date FROM documents ORDER BY issue_date DESC"
+        query = "SELECT DISTINCT issue_date FROM stories ORDER BY issue_date DESC"
         c.execute(query)
         rows = c.fetchall()
-        dates = []
-        for row in rows:
-            date_val = row[0]
-            # Convert date objects to string format YYYYMMDD
-            if isinstance(date_val, (datetime.date, datetime.datetime)):
-                dates.append(date_val.strftime("%Y%m%d"))
-            elif isinstance(date_val, str):
-                dates.append(date_val)
-            else:
-                # Fallback: try to convert to string
-                dates.append(str(date_val))
-        return dates
-    finally:
-        # Only close connection if SQLite (PostgreSQL connection is cached)
-        if use_sqlite:
-            conn.close()
+        return [_date_string(row[0]) for row in rows]
+
+def _date_string(date_val):
+    """Convert an issue_date value (date object or text) to a YYYYMMDD string."""
+    if isinstance(date_val, (datetime.date, datetime.datetime)):
+        return date_val.strftime("%Y%m%d")
+    # Text columns already hold YYYYMMDD; anything else falls back to str()
+    return date_val if isinstance(date_val, str) else str(date_val)
 
+@_retry_on_disconnect
+def fetch_date_counts(db_config, use_sqlite=True, min_id=None):
+    """Count stories per issue date, optionally only those with id > min_id.
+    
+    With min_id set the query only visits the new rows (through the primary
+    key), so a date summary can be kept up to date without scanning the
+    whole table (see date_index.DateIndex).
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        min_id: Only count stories with an id greater than this
+    
+    Returns:
+        Tuple ({date string YYYYMMDD: story count}, largest story id seen or None)
+    """
+    placeholder = "?" if use_sqlite else "%s"
+    query = "SELECT issue_date, COUNT(*), MAX(id) FROM stories"
+    params = ()
+    if min_id is not None:
+        query += f" WHERE id > {placeholder}"
+        params = (min_id,)
+    query += " GROUP BY issue_date"
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        rows = c.fetchall()
+    counts = {}
+    max_id = None
+    for date_val, count, date_max_id in rows:
+        if date_val is None:
+            continue
+        date_str = _date_string(date_val)
+        counts[date_str] = counts.get(date_str, 0) + count
+        max_id = date_max_id if max_id is None else max(max_id, date_max_id)
+    return counts, max_id
+
+@_retry_on_disconnect
 def fetch_story_titles(db_config, date_str, use_sqlite=True):
     """Fetch only titles and IDs for a given date (fast, for list view).
     
@@ -97,18 +270,88 @@ def fetch_story_titles(db_config, date_str, use_sqlite=True):
     Returns:
         List of (story_id, title) tuples
     """
-    conn = _get_connection(use_sqlite, db_config)
-    try:
+    with _connection(use_sqlite, db_config) as conn:
         c = conn.cursor()
         query = "SELECT id, title FROM stories WHERE issue_date=%s ORDER BY id" if not use_sqlite else "SELECT id, title FROM stories WHERE issue_date=? ORDER BY id"
         c.execute(query, (date_str,))
         rows = c.fetchall()
         return [(r[0], r[1]) for r in rows]  # (id, title) tuples
-    finally:
-        # Only close connection if SQLite (PostgreSQL connection is cached)
+
+@_retry_on_disconnect
+def fetch_story_titles_page(db_config, date_str, after_id=None, limit=PAGE_SIZE, use_sqlite=True):
+    """Fetch one page of titles and IDs for a given date, in id order.
+    
+    Keyset pagination: pass the last id of the previous page as after_id, so
+    every page is a short range read instead of an ever-growing OFFSET scan.
+    An index on stories(issue_date, id) lets the database answer it without sorting.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        date_str: The date string to fetch stories for
+        after_id: Only return stories with an id greater than this (None for the first page)
+        limit: Maximum number of rows in the page
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+    
+    Returns:
+        List of (story_id, title) tuples; fewer than limit means it was the last page
+    """
+    placeholder = "?" if use_sqlite else "%s"
+    query = f"SELECT id, title FROM stories WHERE issue_date={placeholder}"
+    params = [date_str]
+    if after_id is not None:
+        query += f" AND id > {placeholder}"
+        params.append(after_id)
+    query += f" ORDER BY id LIMIT {placeholder}"
+    params.append(limit)
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        return [(r[0], r[1]) for r in c.fetchall()]
+
+@_retry_on_disconnect
+def count_story_titles(db_config, date_str, use_sqlite=True):
+    """Number of stories for a given date (the total behind fetch_story_titles_page).
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        date_str: The date string to count stories for
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+    
+    Returns:
+        int
+    """
+    query = "SELECT COUNT(*) FROM stories WHERE issue_date=?" if use_sqlite else "SELECT COUNT(*) FROM stories WHERE issue_date=%s"
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(query, (date_str,))
+        return c.fetchone()[0]
+
+@_retry_on_disconnect
+def fetch_story_ids_in_date_range(db_config, date_range, use_sqlite=True):
+    """Fetch the IDs of every story issued within a date range.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        date_range: (start, end) tuple of issue dates (YYYYMMDD strings or date objects, inclusive)
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+    
+    Returns:
+        List of story IDs, ascending
+    """
+    start, end = date_range
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
         if use_sqlite:
-            conn.close()
+            c.execute("SELECT id FROM stories WHERE issue_date BETWEEN ? AND ? ORDER BY id",
+                      (_sqlite_date(start), _sqlite_date(end)))
+        else:
+            c.execute("SELECT id FROM stories WHERE issue_date BETWEEN %s AND %s ORDER BY id", (start, end))
+        return [r[0] for r in c.fetchall()]
 
+@_retry_on_disconnect
 def fetch_story_content(db_config, story_id, use_sqlite=True):
     """Fetch full content for a single story (lazy load).
     
@@ -122,8 +365,7 @@ def fetch_story_content(db_config, story_id, use_sqlite=True):
         Dictionary with story data: {'id', 'title', 'author', 'issue_date', 'content'}
         Returns None if story not found
     """
-    conn = _get_connection(use_sqlite, db_config)
-    try:
+    with _connection(use_sqlite, db_config) as conn:
         c = conn.cursor()
         query = "SELECT id, title, author, issue_date, content FROM stories WHERE id=%s" if not use_sqlite else "SELECT id, title, author, issue_date, content FROM stories WHERE id=?"
         c.execute(query, (story_id,))
@@ -137,11 +379,76 @@ def fetch_story_content(db_config, story_id, use_sqlite=True):
                 'content': row[4]
             }
         return None
-    finally:
-        # Only close connection if SQLite (PostgreSQL connection is cached)
-        if use_sqlite:
-            conn.close()
 
+@_retry_on_disconnect
+def fetch_story_contents(db_config, story_ids, use_sqlite=True, chunk_size=500):
+    """Fetch full content for many stories in as few queries as possible.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        story_ids: Iterable of story IDs to fetch
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        chunk_size: Maximum IDs per query (keeps SQLite under its bound-parameter limit)
+    
+    Returns:
+        Dictionary {story_id: {'id', 'title', 'author', 'issue_date', 'content'}};
+        IDs that were not found are missing from it
+    """
+    story_ids = list(dict.fromkeys(story_ids))  # drop duplicates, keep order
+    stories = {}
+    if not story_ids:
+        return stories
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        for start in range(0, len(story_ids), chunk_size):
+            chunk = story_ids[start:start + chunk_size]
+            if use_sqlite:
+                placeholders = ",".join("?" * len(chunk))
+                c.execute(f"SELECT id, title, author, issue_date, content FROM stories WHERE id IN ({placeholders})", chunk)
+            else:
+                c.execute("SELECT id, title, author, issue_date, content FROM stories WHERE id = ANY(%s)", (chunk,))
+            for row in c.fetchall():
+                stories[row[0]] = {
+                    'id': row[0],
+                    'title': row[1],
+                    'author': row[2],
+                    'issue_date': row[3],
+                    'content': row[4]
+                }
+    return stories
+
+@_retry_on_disconnect
+def fetch_titles_by_ids(db_config, story_ids, use_sqlite=True, chunk_size=500):
+    """Fetch only the titles of many stories (no content), e.g. to label KNN results.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        story_ids: Iterable of story IDs
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        chunk_size: Maximum IDs per query
+    
+    Returns:
+        Dictionary {story_id: title}; IDs that were not found are missing from it
+    """
+    story_ids = list(dict.fromkeys(story_ids))
+    titles = {}
+    if not story_ids:
+        return titles
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        for start in range(0, len(story_ids), chunk_size):
+            chunk = story_ids[start:start + chunk_size]
+            if use_sqlite:
+                placeholders = ",".join("?" * len(chunk))
+                c.execute(f"SELECT id, title FROM stories WHERE id IN ({placeholders})", chunk)
+            else:
+                c.execute("SELECT id, title FROM stories WHERE id = ANY(%s)", (chunk,))
+            titles.update(c.fetchall())
+    return titles
+
+@_retry_on_disconnect
 def fetch_story_embedding(db_config, story_id, use_sqlite=True):
     """Fetch the embedding vector for a single story from PostgreSQL.
     
@@ -152,88 +459,883 @@ def fetch_story_embedding(db_config, story_id, use_sqlite=True):
         use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
     
     Returns:
-        List of 768 floating point values, or None if not found or if using SQLite
+        float32 numpy array (768 values), or None if not found. Under SQLite the
+        vector comes from the sqlite-vec table (see sync_sqlite_vectors) when
+        it has the story, else from stories.story_embedding.
     """
     if use_sqlite:
-        return None  # Embeddings only available in PostgreSQL
+        conn = _sqlite_vec_connection(db_config)
+        if conn is not None:
+            try:
+                row = conn.execute(f"SELECT embedding FROM {SQLITE_VEC_TABLE} WHERE rowid = ?", (story_id,)).fetchone()
+            except sqlite3.OperationalError:
+                row = None  # Vector table not created yet
+            if row:
+                return np.frombuffer(row[0], dtype=np.float32).copy()
+        row = _sqlite_connection(db_config).execute(
+            "SELECT story_embedding FROM stories WHERE id = ?", (story_id,)
+        ).fetchone()
+        return _decode_embedding(row[0]) if row and row[0] is not None else None
     
-    conn = _get_connection(use_sqlite, db_config)
-    try:
+    with _connection(use_sqlite, db_config) as conn:
         c = conn.cursor()
-        # Assuming story_embeddings table has columns: id (or story_id) and story_embeddings
-        # PostgreSQL arrays are returned as lists, JSONB might need parsing
+        # Arrays come back as lists, pgvector/JSON columns as text; both decode the same way
         query = "SELECT story_embedding FROM stories WHERE id = %s"
         c.execute(query, (story_id,))
         row = c.fetchone()
-        if row and row[0] is not None:
-            embedding = row[0]
-            # Handle different PostgreSQL array types: array, JSONB, or plain list
-            if isinstance(embedding, list):
-                return embedding
-            elif isinstance(embedding, str):
-                # Might be JSONB string, try to parse
-                import json
-                try:
-                    return json.loads(embedding)
-                except:
-                    return None
-            else:
-                # Try to convert to list
-                try:
-                    return list(embedding)
-                except:
-                    return None
-        return None
-    finally:
-        # PostgreSQL connection is cached, don't close
-        pass
+    if row and row[0] is not None:
+        return _decode_embedding(row[0])
+    return None
 
-def fetch_all_story_embeddings(db_config, use_sqlite=True):
+def fetch_all_story_embeddings(db_config, use_sqlite=True, min_id=None):
     """Fetch all story embeddings from PostgreSQL for lazy loading.
     
+    Builds a dictionary on top of stream_story_embeddings; callers that can
+    work with matrices should use the stream directly.
+    
     Args:
         db_config: If use_sqlite is True, this is the SQLite database file path.
                    If use_sqlite is False, this is a dict with PostgreSQL connection params.
         use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        min_id: If set, only fetch stories with id > min_id (incremental refresh)
     
     Returns:
-        Dictionary mapping story_id to embedding list: {story_id: [float, ...], ...}
+        Dictionary mapping story_id to a float32 embedding array: {story_id: array([...]), ...}
         Returns empty dict if using SQLite or if no embeddings found
     """
+    embeddings = {}
+    for story_ids, vectors in stream_story_embeddings(db_config, use_sqlite, min_id=min_id):
+        embeddings.update(zip(story_ids.tolist(), vectors))
+    return embeddings
+
+@_retry_on_disconnect
+def fetch_similar_stories(db_config, story_id, k=5, date_range=None, use_sqlite=False):
+    """Find the k stories most similar to story_id inside PostgreSQL (pgvector).
+    
+    Ranks with ORDER BY story_embedding <=> (query embedding) LIMIT k so a
+    pgvector HNSW index on story_embedding (see ensure_vector_index)
+    answers the query, and no embeddings are sent to the client. Under SQLite
+    the same search runs as a sqlite-vec KNN query (see sync_sqlite_vectors).
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        story_id: The query story ID (excluded from the results)
+        k: Number of most similar stories to return
+        date_range: Optional (start, end) tuple of issue dates (YYYYMMDD strings or
+                    date objects, inclusive) to restrict the candidates to
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+    
+    Returns:
+        List of (story_id, title, similarity_score) tuples sorted by similarity
+        (descending). Empty if the query story has no embedding.
+    """
     if use_sqlite:
-        return {}  # Embeddings only available in PostgreSQL
+        return _fetch_similar_stories_sqlite(db_config, story_id, k, date_range)
     
-    conn = _get_connection(use_sqlite, db_config)
-    embeddings = {}
+    query_embedding = "(SELECT story_embedding FROM stories WHERE id = %(story_id)s)"
+    where = "id <> %(story_id)s AND story_embedding IS NOT NULL"
+    params = {'story_id': story_id, 'k': k}
+    if date_range is not None:
+        where += " AND issue_date BETWEEN %(start)s AND %(end)s"
+        params['start'], params['end'] = date_range
+    query = (
+        f"SELECT id, title, 1 - (story_embedding <=> {query_embedding}) AS score "
+        f"FROM stories WHERE {where} "
+        f"ORDER BY story_embedding <=> {query_embedding} LIMIT %(k)s"
+    )
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(query, params)
+        rows = c.fetchall()
+    return [(r[0], r[1], float(r[2])) for r in rows if r[2] is not None]
+
+def _fetch_similar_stories_sqlite(db_path, story_id, k, date_range):
+    """sqlite-vec version of fetch_similar_stories."""
+    conn = _sqlite_vec_connection(db_path)
+    if conn is None:
+        raise RuntimeError("KNN in SQLite mode needs the sqlite-vec extension ('pip install sqlite-vec')")
+    # Ask for one extra neighbour because the query story finds itself
+    where = f"embedding MATCH (SELECT embedding FROM {SQLITE_VEC_TABLE} WHERE rowid = ?) AND k = ?"
+    params = [story_id, k + 1]
+    if date_range is not None:
+        where += " AND rowid IN (SELECT id FROM stories WHERE issue_date BETWEEN ? AND ?)"
+        params.extend(_sqlite_date(d) for d in date_range)
+    query = (
+        f"WITH knn AS (SELECT rowid AS id, distance FROM {SQLITE_VEC_TABLE} WHERE {where}) "
+        "SELECT knn.id, s.title, 1 - knn.distance FROM knn JOIN stories s ON s.id = knn.id "
+        "WHERE knn.id <> ? ORDER BY knn.distance"
+    )
+    params.append(story_id)
+    rows = conn.execute(query, params).fetchall()
+    return [(r[0], r[1], float(r[2])) for r in rows[:k]]
+
+def _sqlite_date(value):
+    """Format a date for comparison with SQLite's YYYYMMDD issue_date text."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.strftime("%Y%m%d")
+    return str(value)
+
+PG_VECTOR_INDEX = "stories_story_embedding_hnsw"
+
+def ensure_vector_index(db_config, use_sqlite=False):
+    """Create the pgvector HNSW cosine index used by fetch_similar_stories.
+    
+    Run by `main.py batch index`. Building the index on a large table takes
+    a while; it is built CONCURRENTLY so writers are not blocked, and it is
+    a no-op once a valid index exists.
+    
+    Returns:
+        True if the index exists afterwards, False if it does not apply
+        (SQLite, or story_embedding is not a pgvector 'vector' column)
+    """
+    if use_sqlite:
+        return False
+    
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = 'stories'::regclass AND attname = 'story_embedding'"
+        )
+        column = c.fetchone()
+        if column is None or not column[0].startswith("vector"):
+            return False
+        c.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (PG_VECTOR_INDEX,))
+        row = c.fetchone()
+        if row and row[0]:
+            return True
+        conn.rollback()
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+        conn.autocommit = True
+        try:
+            if row:
+                # Left invalid by an interrupted build
+                c.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {PG_VECTOR_INDEX}")
+            c.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {PG_VECTOR_INDEX} "
+                "ON stories USING hnsw (story_embedding vector_cosine_ops)"
+            )
+        finally:
+            conn.autocommit = False
+    return True
+
+SQLITE_FTS_TABLE = "stories_fts"
+PG_SEARCH_COLUMN = "search_document"
+PG_SEARCH_INDEX = "stories_search_document_gin"
+_PG_LEGACY_SEARCH_INDEX = "stories_search_gin"  # expression index used before PG_SEARCH_COLUMN
+# Title matches weigh more than body matches; stored in PG_SEARCH_COLUMN so
+# neither matching nor ranking has to run to_tsvector per row
+_PG_SEARCH_DOCUMENT = (
+    "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B'))"
+)
+
+class SearchIndexMissing(RuntimeError):
+    """search_stories was called before the full-text index was created."""
+
+    def __init__(self):
+        super().__init__("Search index missing; create it with 'python main.py batch index'")
+
+def ensure_search_index(db_config, use_sqlite=True):
+    """Create the full-text index used by search_stories (no-op once it exists).
+    
+    Run by `main.py batch index`; on a large archive this takes a while, so
+    the reader never starts it itself.
+    
+    SQLite: an FTS5 table over stories(title, content), kept in sync by
+    triggers and filled from the existing rows when it is created.
+    PostgreSQL: a stored generated tsvector column (PG_SEARCH_COLUMN) with
+    the weighted title and content, and a GIN index on it built CONCURRENTLY.
+    Adding the column rewrites the stories table once, holding an exclusive
+    lock on it meanwhile; later inserts and updates keep it current.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+    """
+    if use_sqlite:
+        conn = _sqlite_connection(db_config)
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SQLITE_FTS_TABLE,)
+        ).fetchone()
+        if exists:
+            return
+        try:
+            conn.executescript(f"""
+                BEGIN;
+                CREATE VIRTUAL TABLE {SQLITE_FTS_TABLE} USING fts5(
+                    title, content, content='stories', content_rowid='id'
+                );
+                CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ai AFTER INSERT ON stories BEGIN
+                    INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_ad AFTER DELETE ON stories BEGIN
+                    INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+                END;
+                CREATE TRIGGER IF NOT EXISTS {SQLITE_FTS_TABLE}_au AFTER UPDATE OF title, content ON stories BEGIN
+                    INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, title, content)
+                    VALUES ('delete', old.id, old.title, old.content);
+                    INSERT INTO {SQLITE_FTS_TABLE}(rowid, title, content) VALUES (new.id, new.title, new.content);
+                END;
+                INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}) VALUES ('rebuild');
+                COMMIT;
+            """)
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        return
+    
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(
+            "SELECT 1 FROM pg_attribute WHERE attrelid = 'stories'::regclass AND attname = %s AND NOT attisdropped",
+            (PG_SEARCH_COLUMN,)
+        )
+        if c.fetchone() is None:
+            c.execute(
+                f"ALTER TABLE stories ADD COLUMN {PG_SEARCH_COLUMN} tsvector "
+                f"GENERATED ALWAYS AS {_PG_SEARCH_DOCUMENT} STORED"
+            )
+            conn.commit()
+        c.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (PG_SEARCH_INDEX,))
+        row = c.fetchone()
+        conn.rollback()
+        # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction
+        conn.autocommit = True
+        try:
+            if not (row and row[0]):
+                if row:
+                    # Left invalid by an interrupted build
+                    c.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {PG_SEARCH_INDEX}")
+                c.execute(
+                    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {PG_SEARCH_INDEX} "
+                    f"ON stories USING gin ({PG_SEARCH_COLUMN})"
+                )
+            c.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_PG_LEGACY_SEARCH_INDEX}")
+        finally:
+            conn.autocommit = False
+
+@_retry_on_disconnect
+def search_index_exists(db_config, use_sqlite=True):
+    """Whether the full-text index created by ensure_search_index exists (and, in PostgreSQL, is valid)."""
+    if use_sqlite:
+        conn = _sqlite_connection(db_config)
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SQLITE_FTS_TABLE,)
+        ).fetchone() is not None
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (PG_SEARCH_INDEX,))
+        row = c.fetchone()
+    return bool(row and row[0])
+
+def _fts5_query(text):
+    """Turn free text into an FTS5 query matching stories that contain every word."""
+    terms = re.findall(r"\w+", text)
+    return " ".join('"' + term + '"' for term in terms)
+
+@_retry_on_disconnect
+def search_stories(db_config, query, limit=200, use_sqlite=True, date_range=None):
+    """Full-text search over story titles and content across all dates.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        query: Search text; every word must match (PostgreSQL also accepts
+               web-search syntax: "quoted phrases", or, -excluded)
+        limit: Maximum number of results
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        date_range: Optional (start, end) tuple of issue dates (YYYYMMDD strings or
+                    date objects, inclusive) to restrict the matches to
+    
+    Returns:
+        List of (story_id, title) tuples, best match first
+    
+    Raises:
+        SearchIndexMissing: ensure_search_index has not been run, so the
+                            search would have to scan every story
+    """
+    if not search_index_exists(db_config, use_sqlite):
+        raise SearchIndexMissing()
+    if use_sqlite:
+        match = _fts5_query(query)
+        if not match:
+            return []
+        where = f"{SQLITE_FTS_TABLE} MATCH ?"
+        params = [match]
+        if date_range is not None:
+            where += " AND s.issue_date BETWEEN ? AND ?"
+            params.extend(_sqlite_date(d) for d in date_range)
+        params.append(limit)
+        conn = _sqlite_connection(db_config)
+        rows = conn.execute(
+            f"SELECT s.id, s.title FROM {SQLITE_FTS_TABLE} f JOIN stories s ON s.id = f.rowid "
+            f"WHERE {where} ORDER BY bm25({SQLITE_FTS_TABLE}, 10.0, 1.0) LIMIT ?",
+            params
+        ).fetchall()
+        return [(r[0], r[1]) for r in rows]
+    
+    where = f"{PG_SEARCH_COLUMN} @@ q"
+    params = {'query': query, 'limit': limit}
+    if date_range is not None:
+        where += " AND issue_date BETWEEN %(start)s AND %(end)s"
+        params['start'], params['end'] = date_range
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(
+            f"SELECT id, title FROM stories, websearch_to_tsquery('english', %(query)s) q "
+            f"WHERE {where} "
+            f"ORDER BY ts_rank_cd({PG_SEARCH_COLUMN}, q) DESC, id DESC LIMIT %(limit)s",
+            params
+        )
+        return [(r[0], r[1]) for r in c.fetchall()]
+
+NEIGHBORS_TABLE = "story_neighbors"
+
+def ensure_neighbors_table(db_config, use_sqlite=True):
+    """Create the story_neighbors table of precomputed related stories if it is missing.
+    
+    One row per (story_id, rank), rank 1 being the most similar neighbour.
+    It is filled by neighbors.refresh_story_neighbors.
+    """
+    id_type = "INTEGER" if use_sqlite else "BIGINT"
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(
+            f"CREATE TABLE IF NOT EXISTS {NEIGHBORS_TABLE} ("
+            f"story_id {id_type} NOT NULL, rank INTEGER NOT NULL, neighbor_id {id_type} NOT NULL, "
+            "score REAL NOT NULL, PRIMARY KEY (story_id, rank))"
+        )
+        conn.commit()
+
+@_retry_on_disconnect
+def fetch_neighbors_state(db_config, use_sqlite=True):
+    """How far the precomputed story_neighbors table reaches.
+    
+    Both values come from primary key lookups, so this is cheap on any table size.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+    
+    Returns:
+        Tuple (top_n, max_story_id): neighbours stored per story and the
+        newest story covered, or None if the table is missing or empty
+    """
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        if use_sqlite:
+            c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (NEIGHBORS_TABLE,))
+        else:
+            c.execute("SELECT 1 WHERE to_regclass(%s) IS NOT NULL", (NEIGHBORS_TABLE,))
+        if c.fetchone() is None:
+            return None
+        c.execute(
+            f"SELECT story_id, max(rank) FROM {NEIGHBORS_TABLE} "
+            f"WHERE story_id = (SELECT max(story_id) FROM {NEIGHBORS_TABLE}) GROUP BY story_id"
+        )
+        row = c.fetchone()
+    if row is None:
+        return None
+    return row[1], row[0]
+
+@_retry_on_disconnect
+def fetch_precomputed_neighbors(db_config, story_id, k=5, use_sqlite=True):
+    """Read the k most similar stories to story_id from the story_neighbors table.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        story_id: The query story ID
+        k: Number of neighbours to return (at most the table's top_n)
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+    
+    Returns:
+        List of (story_id, title, similarity_score) tuples sorted by similarity
+        (descending); empty if the story has not been precomputed
+    """
+    placeholder = "?" if use_sqlite else "%s"
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(
+            f"SELECT n.neighbor_id, s.title, n.score FROM {NEIGHBORS_TABLE} n "
+            f"JOIN stories s ON s.id = n.neighbor_id "
+            f"WHERE n.story_id = {placeholder} AND n.rank <= {placeholder} ORDER BY n.rank",
+            (story_id, k)
+        )
+        return [(r[0], r[1], float(r[2])) for r in c.fetchall()]
+
+def fetch_neighbor_thresholds(db_config, use_sqlite=True):
+    """Per story in story_neighbors: how many neighbours it has and the lowest score among them.
+    
+    A new story only changes an existing story's list if it scores above
+    that lowest score (or the list is not full yet).
+    
+    Returns:
+        Tuple (story_ids, counts, min_scores) of numpy arrays
+    """
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        c.execute(f"SELECT story_id, count(*), min(score) FROM {NEIGHBORS_TABLE} GROUP BY story_id")
+        rows = c.fetchall()
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+    story_ids, counts, min_scores = zip(*rows)
+    return (np.array(story_ids, dtype=np.int64), np.array(counts, dtype=np.int64),
+            np.array(min_scores, dtype=np.float32))
+
+def replace_story_neighbors(db_config, neighbors, use_sqlite=True, clear=False):
+    """Store the neighbour lists of some stories, replacing their previous lists.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        neighbors: {story_id: [(neighbor_id, score), ...] best first}
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        clear: Delete every stored list first (full rebuild)
+    """
+    rows = [
+        (story_id, rank, neighbor_id, float(score))
+        for story_id, neighbours in neighbors.items()
+        for rank, (neighbor_id, score) in enumerate(neighbours, start=1)
+    ]
+    story_ids = list(neighbors)
+    with _connection(use_sqlite, db_config) as conn:
+        c = conn.cursor()
+        try:
+            if use_sqlite:
+                if clear:
+                    c.execute(f"DELETE FROM {NEIGHBORS_TABLE}")
+                for start in range(0, len(story_ids), 500):
+                    chunk = story_ids[start:start + 500]
+                    c.execute(f"DELETE FROM {NEIGHBORS_TABLE} WHERE story_id IN ({','.join('?' * len(chunk))})", chunk)
+                c.executemany(f"INSERT INTO {NEIGHBORS_TABLE}(story_id, rank, neighbor_id, score) VALUES (?, ?, ?, ?)", rows)
+            else:
+                if clear:
+                    c.execute(f"TRUNCATE {NEIGHBORS_TABLE}")
+                c.execute(f"DELETE FROM {NEIGHBORS_TABLE} WHERE story_id = ANY(%s)", (story_ids,))
+                psycopg2.extras.execute_values(
+                    c, f"INSERT INTO {NEIGHBORS_TABLE}(story_id, rank, neighbor_id, score) VALUES %s", rows,
+                    page_size=1000
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+def _decode_embedding(embedding):
+    """Decode one embedding value into a float32 array.
+    
+    Handles PostgreSQL arrays (lists), pgvector/JSON text ('[1,2,...]'),
+    array text ('{1,2,...}') and raw float32 blobs (SQLite) without building
+    an intermediate Python list.
+    
+    Returns:
+        1-D float32 numpy array, or None if the value could not be decoded
+    """
     try:
+        if isinstance(embedding, (bytes, memoryview)):
+            values = np.frombuffer(embedding, dtype=np.float32).copy()
+        elif isinstance(embedding, str):
+            values = np.fromstring(embedding.strip().strip('[]{}'), dtype=np.float32, sep=',')
+        else:
+            values = np.asarray(embedding, dtype=np.float32)
+    except (ValueError, TypeError):
+        return None
+    if values.ndim != 1 or len(values) == 0:
+        return None
+    return values
+
+_COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00"
+
+def _copy_row_dtype(id_len, dim):
+    """numpy dtype for one fixed-width binary COPY row of (id, real[])."""
+    return np.dtype([
+        ('field_count', '>i2'),
+        ('id_len', '>i4'),
+        ('id', '>i8' if id_len == 8 else '>i4'),
+        ('array_len', '>i4'),
+        ('ndim', '>i4'),
+        ('has_null', '>i4'),
+        ('elem_oid', '>i4'),
+        ('dim', '>i4'),
+        ('lower_bound', '>i4'),
+        ('elems', [('len', '>i4'), ('value', '>f4')], (dim,)),
+    ])
+
+def decode_binary_copy(buf):
+    """Decode the output of COPY (SELECT id, embedding::real[]) TO STDOUT (FORMAT binary).
+    
+    Rows of the same width (the normal case: one id type, one embedding
+    dimension, no NULL elements) are decoded in bulk through a structured
+    numpy dtype, so no Python object is created per row or per element.
+    Rows that break the pattern are decoded one at a time.
+    
+    Args:
+        buf: bytes-like object holding the complete COPY output
+    
+    Returns:
+        Tuple (story_ids, vectors, last_id): an int64 array, a float32 matrix
+        and the id of the last row in the stream (None if it had no rows).
+        Rows with a NULL embedding, NULL elements or a different dimension
+        than the first row are dropped but still count towards last_id.
+    """
+    view = memoryview(buf)
+    if bytes(view[:11]) != _COPY_SIGNATURE:
+        raise ValueError("Not a PostgreSQL binary COPY stream")
+    ext_len = int.from_bytes(view[15:19], 'big')
+    pos = 19 + ext_len
+    end = len(view)
+    
+    id_chunks, vector_chunks = [], []
+    dim = None
+    row_dtype = None
+    last_id = None
+    while pos + 2 <= end:
+        field_count = int.from_bytes(view[pos:pos + 2], 'big', signed=True)
+        if field_count == -1:
+            break  # trailer
+        
+        if row_dtype is not None:
+            # Fast path: decode every following row that has the expected layout
+            n = (end - pos) // row_dtype.itemsize
+            rows = np.frombuffer(view[pos:pos + n * row_dtype.itemsize], dtype=row_dtype)
+            ok = ((rows['field_count'] == 2) & (rows['id_len'] == row_dtype['id'].itemsize)
+                  & (rows['array_len'] == row_dtype.itemsize - 10 - row_dtype['id'].itemsize)
+                  & (rows['ndim'] == 1) & (rows['has_null'] == 0) & (rows['dim'] == dim))
+            good = n if ok.all() else int(np.argmin(ok))
+            if good:
+                id_chunks.append(rows['id'][:good].astype(np.int64))
+                vector_chunks.append(rows['elems']['value'][:good].astype(np.float32))
+                last_id = int(rows['id'][good - 1])
+                pos += good * row_dtype.itemsize
+                continue
+        
+        # Slow path: walk a single row field by field
+        pos += 2
+        fields = []
+        for _ in range(field_count):
+            length = int.from_bytes(view[pos:pos + 4], 'big', signed=True)
+            pos += 4
+            if length == -1:
+                fields.append(None)
+            else:
+                fields.append(view[pos:pos + length])
+                pos += length
+        if len(fields) != 2 or fields[0] is None:
+            continue
+        raw_id, raw_array = fields
+        last_id = int.from_bytes(raw_id, 'big', signed=True)
+        if raw_array is None:
+            continue
+        ndim, has_null = int.from_bytes(raw_array[0:4], 'big'), int.from_bytes(raw_array[4:8], 'big')
+        if ndim != 1 or has_null:
+            continue
+        row_dim = int.from_bytes(raw_array[12:16], 'big')
+        if dim is None:
+            dim = row_dim
+            row_dtype = _copy_row_dtype(len(raw_id), dim)
+        elif row_dim != dim:
+            continue
+        elems = np.frombuffer(raw_array[20:], dtype=[('len', '>i4'), ('value', '>f4')])
+        id_chunks.append(np.array([last_id], dtype=np.int64))
+        vector_chunks.append(elems['value'].astype(np.float32)[np.newaxis, :])
+    
+    if not id_chunks:
+        return np.empty(0, dtype=np.int64), np.empty((0, dim or 0), dtype=np.float32), last_id
+    return np.concatenate(id_chunks), np.concatenate(vector_chunks), last_id
+
+@_retry_on_disconnect
+def count_story_embeddings(db_config, use_sqlite=True, min_id=None):
+    """Count stories that have an embedding.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        min_id: If set, only count stories with id > min_id
+    
+    Returns:
+        Number of stories with a non-NULL story_embedding
+    """
+    with _connection(use_sqlite, db_config) as conn:
         c = conn.cursor()
-        # Fetch all embeddings: id and story_embeddings column
+        query = "SELECT count(*) FROM stories WHERE story_embedding IS NOT NULL"
+        if min_id is not None:
+            c.execute(query + (" AND id > ?" if use_sqlite else " AND id > %s"), (min_id,))
+        else:
+            c.execute(query)
+        return c.fetchone()[0]
+
+def stream_story_embeddings(db_config, use_sqlite=True, min_id=None, itersize=2000, progress=None, binary=True):
+    """Stream story embeddings in batches, without piling rows up client-side.
+    
+    By default each batch is a COPY ... TO STDOUT (FORMAT binary) of the next
+    itersize ids, decoded straight into numpy by decode_binary_copy. If the
+    embedding column cannot be cast to real[] (e.g. JSON text), this falls
+    back to a named (server-side) cursor over the text representation.
+    Under SQLite the story_embedding column (JSON text or float32 blob) is
+    read in keyset pages of itersize ids.
+    
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        min_id: If set, only fetch stories with id > min_id (incremental refresh)
+        itersize: Number of rows fetched from the server per round trip
+        progress: Optional callback progress(rows_loaded, total_rows), called
+                  once before the first batch and after every batch
+        binary: Use the binary COPY path (False forces the text path)
+    
+    Yields:
+        Tuples (story_ids, vectors): an int64 array and a float32 matrix with
+        one row per story. Rows whose embedding cannot be decoded are dropped.
+    """
+    total = None
+    if progress is not None:
+        total = count_story_embeddings(db_config, use_sqlite, min_id)
+        progress(0, total)
+    
+    # One pooled connection for the whole stream; it goes back to the pool
+    # when the generator finishes or is closed
+    with _connection(use_sqlite, db_config) as conn:
+        if use_sqlite:
+            batches = _stream_embeddings_sqlite(conn, min_id, itersize)
+        else:
+            batches = _stream_embeddings_text(conn, min_id, itersize)
+        if binary and not use_sqlite:
+            try:
+                first = next(_stream_embeddings_binary(conn, min_id, 1), None)
+            except _ConnectionDropped:
+                raise
+            except psycopg2.Error:
+                # Column type has no real[] cast; use the text path
+                conn.rollback()
+            else:
+                if first is not None:
+                    batches = _stream_embeddings_binary(conn, min_id, itersize)
+        
+        loaded = 0
+        for story_ids, vectors, rows_read in batches:
+            loaded += rows_read
+            if len(story_ids):
+                yield story_ids, vectors
+            if progress is not None:
+                progress(loaded, total)
+
+def _stream_embeddings_binary(conn, min_id, itersize):
+    """Yield (story_ids, vectors, rows_read) from keyset-paged binary COPYs."""
+    c = conn.cursor()
+    last_id = min_id
+    while True:
+        where = "story_embedding IS NOT NULL"
+        params = []
+        if last_id is not None:
+            where += " AND id > %s"
+            params.append(last_id)
+        params.append(itersize)
+        query = c.mogrify(
+            f"COPY (SELECT id, story_embedding::real[] FROM stories WHERE {where} ORDER BY id LIMIT %s) "
+            "TO STDOUT (FORMAT binary)",
+            params
+        ).decode()
+        buf = io.BytesIO()
+        c.copy_expert(query, buf)
+        story_ids, vectors, chunk_last_id = decode_binary_copy(buf.getbuffer())
+        if chunk_last_id is None:
+            return
+        yield story_ids, vectors, len(story_ids)
+        last_id = chunk_last_id
+
+def _stream_embeddings_text(conn, min_id, itersize):
+    """Yield (story_ids, vectors, rows_read) from a named server-side cursor."""
+    c = conn.cursor(name="stream_story_embeddings")
+    c.itersize = itersize
+    try:
         query = "SELECT id, story_embedding FROM stories WHERE story_embedding IS NOT NULL"
-        c.execute(query)
-        rows = c.fetchall()
+        if min_id is not None:
+            c.execute(query + " AND id > %s ORDER BY id", (min_id,))
+        else:
+            c.execute(query + " ORDER BY id")
         
-        for row in rows:
-            story_id = row[0]
-            embedding = row[1]
-            if embedding is not None:
-                # Handle different PostgreSQL array types
-                if isinstance(embedding, list):
-                    embeddings[story_id] = embedding
-                elif isinstance(embedding, str):
-                    # Might be JSONB string
-                    import json
-                    try:
-                        embeddings[story_id] = json.loads(embedding)
-                    except:
-                        continue
-                else:
-                    # Try to convert to list
+        while True:
+            rows = c.fetchmany(itersize)
+            if not rows:
+                break
+            yield _decode_embedding_rows(rows)
+    finally:
+        c.close()
+
+def _stream_embeddings_sqlite(conn, min_id, itersize):
+    """Yield (story_ids, vectors, rows_read) from keyset pages of the SQLite stories table."""
+    last_id = min_id if min_id is not None else -1
+    while True:
+        rows = conn.execute(
+            "SELECT id, story_embedding FROM stories WHERE story_embedding IS NOT NULL AND id > ? "
+            "ORDER BY id LIMIT ?",
+            (last_id, itersize)
+        ).fetchall()
+        if not rows:
+            return
+        yield _decode_embedding_rows(rows)
+        last_id = rows[-1][0]
+
+def _decode_embedding_rows(rows):
+    """Decode (story_id, embedding) rows into (story_ids, vectors, rows_read).
+    
+    Rows that cannot be decoded, or whose dimension differs from the first
+    decodable row, are dropped.
+    """
+    ids = np.empty(len(rows), dtype=np.int64)
+    vectors = None
+    filled = 0
+    for story_id, embedding in rows:
+        values = _decode_embedding(embedding) if embedding is not None else None
+        if values is None:
+            continue
+        if vectors is None:
+            # First decodable row tells us the dimension
+            vectors = np.empty((len(rows), len(values)), dtype=np.float32)
+        elif len(values) != vectors.shape[1]:
+            continue
+        vectors[filled] = values
+        ids[filled] = story_id
+        filled += 1
+    if filled:
+        return ids[:filled], vectors[:filled], len(rows)
+    return ids[:0], np.empty((0, 0), dtype=np.float32), len(rows)
+
+SQLITE_VEC_TABLE = "story_vectors"
+
+def _load_sqlite_vec(conn):
+    """Load the sqlite-vec extension into conn.
+    
+    Returns:
+        None on success, else why it could not be loaded
+    """
+    try:
+        import sqlite_vec
+    except ImportError:
+        return "sqlite-vec is not installed ('pip install sqlite-vec')"
+    try:
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+    except AttributeError:
+        # e.g. pyenv and macOS builds without --enable-loadable-sqlite-extensions
+        return "this Python's sqlite3 module cannot load extensions"
+    except sqlite3.OperationalError as e:
+        return f"sqlite-vec failed to load: {e}"
+    return None
+
+def sqlite_vec_error(db_path):
+    """Why sqlite-vec is unavailable for db_path, or None if it is loaded.
+    
+    Without it, SQLite mode has no vector table: KNN must run over
+    embeddings loaded into this process instead.
+    """
+    _sqlite_connection(db_path)
+    return _sqlite_local.connections[db_path][1]
+
+def has_sqlite_vectors(db_path):
+    """Whether sqlite-vec is loaded and the vector table filled by sync_sqlite_vectors exists."""
+    conn = _sqlite_vec_connection(db_path)
+    if conn is None:
+        return False
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (SQLITE_VEC_TABLE,)
+    ).fetchone() is not None
+
+def _sqlite_vec_connection(db_path):
+    """This thread's SQLite connection if it has sqlite-vec loaded, else None."""
+    return _sqlite_connection(db_path, with_vec=True)
+
+def _create_sqlite_vec_table(conn, dim):
+    conn.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_VEC_TABLE} "
+        f"USING vec0(embedding float[{int(dim)}] distance_metric=cosine)"
+    )
+
+def sync_sqlite_vectors(db_path, batch_size=2000):
+    """Copy new embeddings from stories.story_embedding into the sqlite-vec table.
+    
+    story_embedding may hold JSON text ('[0.1, ...]') or a raw float32 blob;
+    sqlite-vec parses both natively, so rows are copied with plain
+    INSERT ... SELECT in id order, starting after the largest id already in
+    the vector table. Run by `main.py batch index`; the reader only reads
+    the table.
+    
+    Args:
+        db_path: SQLite database file path
+        batch_size: Rows copied per transaction
+    
+    Returns:
+        Number of vectors added, or None if sqlite-vec is unavailable or the
+        stories table has no story_embedding column
+    """
+    conn = _sqlite_vec_connection(db_path)
+    if conn is None:
+        return None
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(stories)")]
+        if "story_embedding" not in columns:
+            return None
+        
+        try:
+            last_id = conn.execute(f"SELECT max(rowid) FROM {SQLITE_VEC_TABLE}").fetchone()[0] or 0
+        except sqlite3.OperationalError:
+            # No vector table yet: size it from the first embedding
+            row = conn.execute(
+                "SELECT story_embedding FROM stories WHERE story_embedding IS NOT NULL ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return 0
+            first = np.frombuffer(row[0], dtype=np.float32) if isinstance(row[0], bytes) else _decode_embedding(row[0])
+            if first is None:
+                return 0
+            _create_sqlite_vec_table(conn, len(first))
+            last_id = 0
+        
+        added = 0
+        while True:
+            batch_end = conn.execute(
+                "SELECT max(id) FROM (SELECT id FROM stories WHERE id > ? AND story_embedding IS NOT NULL "
+                "ORDER BY id LIMIT ?)",
+                (last_id, batch_size)
+            ).fetchone()[0]
+            if batch_end is None:
+                break
+            try:
+                cur = conn.execute(
+                    f"INSERT INTO {SQLITE_VEC_TABLE}(rowid, embedding) "
+                    "SELECT id, story_embedding FROM stories "
+                    "WHERE id > ? AND id <= ? AND story_embedding IS NOT NULL ORDER BY id",
+                    (last_id, batch_end)
+                )
+                added += cur.rowcount
+            except sqlite3.Error:
+                # A malformed embedding fails the whole statement; retry row by row
+                conn.rollback()
+                rows = conn.execute(
+                    "SELECT id, story_embedding FROM stories "
+                    "WHERE id > ? AND id <= ? AND story_embedding IS NOT NULL ORDER BY id",
+                    (last_id, batch_end)
+                ).fetchall()
+                for sid, embedding in rows:
                     try:
-                        embeddings[story_id] = list(embedding)
-                    except:
+                        conn.execute(f"INSERT INTO {SQLITE_VEC_TABLE}(rowid, embedding) VALUES (?, ?)", (sid, embedding))
+                        added += 1
+                    except sqlite3.Error:
                         continue
-        
-        return embeddings
-    finally:
-        # PostgreSQL connection is cached, don't close
-        pass
\ No newline at end of file
+            conn.commit()
+            last_id = batch_end
+        return added
+    except Exception:
+        conn.rollback()
+        raise
+
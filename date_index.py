@@ -0,0 +1,98 @@
+# date_index.py
+# Local cache of the issue dates (and story counts per date) in a database
+
+import os
+import json
+
+from embedding_cache import default_cache_root, source_key
+
+DATES_FILE = "dates.json"
+
+
+class DateIndex:
+    """Issue dates with their story counts, cached in a JSON file next to the embedding cache.
+
+    Startup reads the file instead of running SELECT DISTINCT over the whole
+    archive; the caller then merges in database.fetch_date_counts(...,
+    min_id=index.max_id), which counts only the stories added since.
+
+    Stories that are deleted or moved to another date after being counted
+    are not noticed until the file is cleared.
+
+    File layout:
+        {"max_id": int or null, "counts": {"YYYYMMDD": int, ...}}
+
+    Readers on other threads see either the old or the new state: merge()
+    swaps in new objects instead of changing them in place.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.counts = {}
+        self.dates = []  # newest first
+        self.max_id = None
+        self._read()
+
+    @classmethod
+    def for_source(cls, db_config, cache_root=None):
+        """Index for a given database (SQLite path or PostgreSQL params dict)."""
+        root = cache_root or default_cache_root()
+        return cls(os.path.join(root, source_key(db_config), DATES_FILE))
+
+    def __len__(self):
+        return len(self.dates)
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            counts = {str(date): int(count) for date, count in data['counts'].items()}
+            max_id = data.get('max_id')
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return
+        self._set(counts, max_id)
+
+    def _set(self, counts, max_id):
+        self.dates = sorted(counts, reverse=True)
+        self.counts = counts
+        self.max_id = max_id
+
+    def merge(self, new_counts, max_id):
+        """Add per-date counts for stories newer than max_id and save the file.
+
+        Args:
+            new_counts: {date string: story count} for the new stories
+            max_id: Largest story id counted, or None if there were no new stories
+
+        Returns:
+            True if anything changed
+        """
+        if not new_counts and (max_id is None or max_id == self.max_id):
+            return False
+        counts = dict(self.counts)
+        for date, count in new_counts.items():
+            counts[date] = counts.get(date, 0) + count
+        if self.max_id is not None and max_id is not None:
+            max_id = max(max_id, self.max_id)
+        self._set(counts, max_id if max_id is not None else self.max_id)
+        self.save()
+        return True
+
+    def save(self):
+        """Write the file atomically; a read-only cache directory is ignored."""
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({'max_id': self.max_id, 'counts': self.counts}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def clear(self):
+        """Forget every date and delete the file."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self._set({}, None)
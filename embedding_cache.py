@@ -0,0 +1,181 @@
+# embedding_cache.py
+# Local on-disk cache of story embeddings, memory-mapped at startup
+
+import os
+import re
+import json
+import numpy as np
+
+META_FILE = "meta.json"
+IDS_FILE = "ids.i64"
+MATRIX_FILE = "embeddings.f32"
+NORMS_FILE = "norms.f32"
+
+
+def default_cache_root():
+    """Directory that holds one embedding cache per database."""
+    return os.getenv(
+        "EMBEDDING_CACHE_DIR",
+        os.path.join(os.path.expanduser("~"), ".cache", "news-story-reader")
+    )
+
+
+def source_key(db_config):
+    """Turn a db_config into a filesystem-safe directory name (shared by the local caches)."""
+    if isinstance(db_config, dict):
+        raw = f"pg_{db_config.get('host', '')}_{db_config.get('port', '')}_{db_config.get('database', '')}"
+    else:
+        raw = f"sqlite_{os.path.abspath(db_config)}"
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", raw).strip("_")
+
+
+class EmbeddingCache:
+    """Raw float32 embedding matrix plus id and norm index files on disk.
+
+    Layout of the cache directory:
+        embeddings.f32  row-major float32 matrix, one row per story
+        ids.i64         int64 story id for each row
+        norms.f32       float32 L2 norm for each row
+        meta.json       {"dim": int, "count": int, "max_id": int}
+
+    meta.json is written last (atomically), so rows appended by an
+    interrupted write are ignored and truncated on the next write.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.meta = self._read_meta()
+
+    @classmethod
+    def for_source(cls, db_config, cache_root=None):
+        """Cache for a given database (SQLite path or PostgreSQL params dict)."""
+        root = cache_root or default_cache_root()
+        return cls(os.path.join(root, source_key(db_config)))
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_FILE)) as f:
+                meta = json.load(f)
+            return {'dim': int(meta['dim']), 'count': int(meta['count']), 'max_id': meta.get('max_id')}
+        except (OSError, ValueError, KeyError, TypeError):
+            return {'dim': None, 'count': 0, 'max_id': None}
+
+    def _write_meta(self):
+        tmp_path = self._path(META_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, self._path(META_FILE))
+
+    @property
+    def count(self):
+        return self.meta['count']
+
+    @property
+    def max_id(self):
+        """Largest story id in the cache, or None when the cache is empty."""
+        return self.meta['max_id']
+
+    def load(self):
+        """Memory-map the cached rows.
+
+        Returns:
+            Tuple (ids, matrix, norms) of read-only arrays, or None if the
+            cache is empty or its files are missing/truncated
+        """
+        count, dim = self.meta['count'], self.meta['dim']
+        if not count or not dim:
+            return None
+        try:
+            ids = np.memmap(self._path(IDS_FILE), dtype=np.int64, mode='r', shape=(count,))
+            matrix = np.memmap(self._path(MATRIX_FILE), dtype=np.float32, mode='r', shape=(count, dim))
+            norms = np.memmap(self._path(NORMS_FILE), dtype=np.float32, mode='r', shape=(count,))
+        except (OSError, ValueError):
+            return None
+        return ids, matrix, norms
+
+    def load_into(self, store, appended=False):
+        """Point an EmbeddingStore at the memory-mapped cache.
+
+        Args:
+            store: EmbeddingStore to update
+            appended: True if the store already holds every cached row except
+                      those appended by the latest write (see EmbeddingStore.replace)
+
+        Returns:
+            Number of rows loaded
+        """
+        arrays = self.load()
+        if arrays is None:
+            return 0
+        store.replace(*arrays, appended=appended)
+        return len(arrays[0])
+
+    def write(self, story_ids, vectors):
+        """Add embeddings to the cache.
+
+        Rows for story ids already in the cache are overwritten in place,
+        all other rows are appended.
+
+        Args:
+            story_ids: Sequence of story IDs
+            vectors: 2-D array-like of shape (len(story_ids), dim)
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if len(story_ids) == 0:
+            return
+        dim = vectors.shape[1]
+        if self.meta['dim'] not in (None, dim):
+            # Embedding model changed; the old rows are useless
+            self.clear()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        count = self.meta['count']
+
+        ids = np.asarray(story_ids, dtype=np.int64)
+        row_of = {}
+        if self.meta['max_id'] is not None and ids.min() <= self.meta['max_id']:
+            # Only build the id index when some ids may already be cached
+            arrays = self.load()
+            if arrays is not None:
+                row_of = dict(zip(arrays[0].tolist(), range(count)))
+        existing = np.array([row_of.get(sid, -1) for sid in ids.tolist()], dtype=np.int64)
+        is_new = existing < 0
+        norms = np.linalg.norm(vectors, axis=1).astype(np.float32)
+
+        row_bytes = dim * 4
+        with open(self._path(MATRIX_FILE), "ab+") as m, \
+                open(self._path(IDS_FILE), "ab+") as i, \
+                open(self._path(NORMS_FILE), "ab+") as n:
+            # Drop anything past the committed row count (interrupted write)
+            m.truncate(count * row_bytes)
+            i.truncate(count * 8)
+            n.truncate(count * 4)
+            m.write(vectors[is_new].tobytes())
+            i.write(ids[is_new].tobytes())
+            n.write(norms[is_new].tobytes())
+
+        if (~is_new).any():
+            with open(self._path(MATRIX_FILE), "r+b") as m, open(self._path(NORMS_FILE), "r+b") as n:
+                for pos in np.flatnonzero(~is_new):
+                    row = int(existing[pos])
+                    m.seek(row * row_bytes)
+                    m.write(vectors[pos].tobytes())
+                    n.seek(row * 4)
+                    n.write(norms[pos].tobytes())
+
+        max_id = int(ids.max())
+        if self.meta['max_id'] is not None:
+            max_id = max(max_id, self.meta['max_id'])
+        self.meta = {'dim': dim, 'count': count + int(is_new.sum()), 'max_id': max_id}
+        self._write_meta()
+
+    def clear(self):
+        """Delete every cached row."""
+        for name in (META_FILE, IDS_FILE, MATRIX_FILE, NORMS_FILE):
+            try:
+                os.remove(self._path(name))
+            except FileNotFoundError:
+                pass
+        self.meta = {'dim': None, 'count': 0, 'max_id': None}
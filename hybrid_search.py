@@ -0,0 +1,88 @@
+# hybrid_search.py
+# Keyword + embedding search merged with reciprocal rank fusion
+
+import asyncio
+
+import async_database as db
+
+RRF_K = 60  # rank offset from the original RRF paper; damps the weight of the very top ranks
+DEFAULT_CANDIDATES = 100
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, limit=None):
+    """Merge several rankings into one with reciprocal rank fusion.
+
+    Each item scores sum(1 / (k + rank)) over the rankings it appears in
+    (rank starting at 1), so items ranked well by several lists rise to the
+    top without the lists' raw scores having to be comparable.
+
+    Args:
+        rankings: Iterable of lists of story IDs, each best first
+        k: Rank offset; larger values flatten the difference between ranks
+        limit: Maximum number of results, or None for all
+
+    Returns:
+        List of tuples: [(story_id, fused_score), ...] sorted by fused score (descending)
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, story_id in enumerate(ranking, start=1):
+            fused[story_id] = fused.get(story_id, 0.0) + 1.0 / (k + rank)
+    # Ties keep the order the IDs were first seen in (the earlier ranking wins)
+    merged = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+    return merged[:limit] if limit is not None else merged
+
+
+async def hybrid_search(db_config, query, story_id=None, store=None, k=20, date_range=None,
+                        use_sqlite=True, candidates=DEFAULT_CANDIDATES):
+    """Stories that match query and/or are similar to story_id, fused with RRF.
+
+    The full-text ranking comes from database.search_stories. The vector
+    ranking comes from store (an EmbeddingStore) when given, otherwise from
+    the database (pgvector / sqlite-vec). A date_range is applied before any
+    scoring: the keyword and database queries filter on it, and a local
+    store only scores the embeddings of stories in the range.
+
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        query: Full-text search terms; empty skips the keyword ranking
+        story_id: Story whose embedding is the vector query (excluded from the
+                  results); None skips the vector ranking
+        store: Optional EmbeddingStore to score locally
+        k: Number of results to return
+        date_range: Optional (start, end) tuple of issue dates (YYYYMMDD strings or
+                    date objects, inclusive)
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        candidates: Length of each ranking fed into the fusion
+
+    Returns:
+        List of tuples: [(story_id, fused_score), ...] sorted by fused score (descending)
+    """
+    async def keyword_ranking():
+        if not query:
+            return []
+        found = await db.search_stories(db_config, query, candidates, use_sqlite, date_range)
+        return [sid for sid, _ in found if sid != story_id]
+
+    async def vector_ranking():
+        if story_id is None:
+            return []
+        if store is None:
+            similar = await db.fetch_similar_stories(db_config, story_id, candidates, date_range, use_sqlite)
+            return [sid for sid, _, _ in similar]
+        query_embedding = store.get(story_id)
+        if query_embedding is None:
+            query_embedding = await db.fetch_story_embedding(db_config, story_id, use_sqlite)
+        if query_embedding is None:
+            return []
+        candidate_ids = None
+        if date_range is not None:
+            candidate_ids = await db.fetch_story_ids_in_date_range(db_config, date_range, use_sqlite)
+        similar = await asyncio.to_thread(
+            store.find_k_most_similar, query_embedding, candidates, story_id, candidate_ids
+        )
+        return [sid for sid, _ in similar]
+
+    rankings = await asyncio.gather(keyword_ranking(), vector_ranking())
+    return reciprocal_rank_fusion(rankings, limit=k)
@@ -1,85 +1,537 @@
 # main.py
 import sys
-import curses
 import datetime
 import os
 import argparse
 import threading
+import asyncio
+from collections import OrderedDict
 from dotenv import load_dotenv
 
 # Our own modules
-from database import fetch_all_dates, fetch_story_titles, fetch_story_content, close_db_connection, fetch_all_story_embeddings
-from copy_commands import copy_stories
-from views.list_view import display_list
-from views.story_view import display_story
-from views.date_popup import display_dates_popup
-from similarity import find_k_most_similar
+from database import db_config_from_env, close_db_connection, SearchIndexMissing
+import async_database as db
+from async_database import run as run_async, submit as submit_async, close_async_database
+from similarity import EmbeddingStore, IncrementalKNN
+from hybrid_search import hybrid_search
+from story_cache import StoryCache
+from date_index import DateIndex
+from title_pages import TitlePages, PAGE_SIZE
+from prefetch import Prefetcher
+from embedding_cache import EmbeddingCache
+from ann_index import load_or_build_index
 
 all_dates = []  # We'll populate this once we know db_config
+DATE_TITLES_LIMIT = 32  # Dates whose title lists are kept in memory
 
-def wait_for_embeddings(stdscr, embeddings_ready, all_embeddings):
-    """Wait for embeddings to be ready, showing a message if needed.
+def parse_knn_command(cmd, default_ann=False):
+    """Parse a KNN command such as 'k', 'k5', 'k 5', 'ka10' or 'ke 3'.
     
-    Returns True if embeddings are available, False otherwise.
-    """
-    if embeddings_ready.is_set():
-        return len(all_embeddings) > 0
+    An 'a' after the k forces the approximate (IVF) index, an 'e' forces an
+    exact brute-force search; otherwise default_ann decides.
     
-    # Show loading message and wait
-    stdscr.clear()
-    stdscr.addstr(0, 2, "Waiting for embeddings to load...", curses.A_BOLD)
-    stdscr.addstr(2, 2, "This may take a moment. Please wait...")
-    stdscr.refresh()
+    Returns:
+        Tuple (k, use_ann); k defaults to 5 if no valid number is given
+    """
+    rest = cmd[1:].strip()
+    use_ann = default_ann
+    if rest[:1] in ("a", "A"):
+        use_ann = True
+        rest = rest[1:].strip()
+    elif rest[:1] in ("e", "E"):
+        use_ann = False
+        rest = rest[1:].strip()
+    try:
+        k = int(rest) if rest else 5
+    except ValueError:
+        k = 5
+    return k, use_ann
+
+def parse_hybrid_command(cmd):
+    """Parse a hybrid search command such as 'h tariffs' or 'h 20240101-20240131 trade tariffs'.
     
-    # Wait for embeddings to be ready (with timeout to avoid infinite wait)
-    embeddings_ready.wait(timeout=300)  # 5 minute timeout
+    A leading YYYYMMDD-YYYYMMDD (or a single YYYYMMDD) limits the search to
+    those issue dates; the rest are the keywords.
     
-    if embeddings_ready.is_set() and len(all_embeddings) > 0:
-        return True
-    return False
+    Returns:
+        Tuple (query, date_range); date_range is None or a (start, end) tuple
+    """
+    words = cmd[1:].split()
+    date_range = None
+    if words:
+        start, _, end = words[0].partition("-")
+        end = end or start
+        if len(start) == len(end) == 8 and start.isdigit() and end.isdigit():
+            date_range = (min(start, end), max(start, end))
+            words = words[1:]
+    return " ".join(words), date_range
 
-def tui(stdscr, db_config, default_datestring, use_sqlite=True):
+def tui(stdscr, db_config, default_datestring, use_sqlite=True, rebuild_embedding_cache=False, use_ann=False,
+        knn_mode="local", rebuild_date_index=False, ann_lists=None, ann_probes=None):
+    # The curses side is imported here so `main.py batch` never loads it
+    import curses
+    from copy_commands import copy_stories
+    from views.list_view import display_list
+    from views.story_view import display_story
+    from views.date_popup import display_dates_popup
+    from views.messages import draw_knn_progress, show_message
+    
     curses.curs_set(0)
     global all_dates
-    all_dates = fetch_all_dates(db_config, use_sqlite)
+    # Queries run on the async_database event loop; run_async waits for one,
+    # submit_async leaves it running next to this input loop
+    
+    # Dates and per-date story counts come from the local date index; stories
+    # added since it was saved are counted in the background (see dates_job)
+    date_summary = DateIndex.for_source(db_config)
+    if rebuild_date_index:
+        date_summary.clear()
+    summary_was_cached = len(date_summary) > 0
+    if not summary_was_cached:
+        # First run against this database: one full count
+        date_summary.merge(*run_async(db.fetch_date_counts(db_config, use_sqlite)))
+    all_dates = date_summary.dates or run_async(db.fetch_all_dates(db_config, use_sqlite))
     if not default_datestring in all_dates:
         default_datestring = all_dates[0]
 
-    # Load only titles initially (lazy loading)
-    story_list = fetch_story_titles(db_config, default_datestring, use_sqlite)
-    titles = [title for _, title in story_list]  # Extract just titles for display
-    story_ids = [story_id for story_id, _ in story_list]  # Keep IDs for lazy loading
-    story_cache = {}  # Cache loaded story content: {story_id: {'title': ..., 'content': ...}}
+    # Titles of recently shown (or prefetched) dates: {datestring: TitlePages}
+    # (only touched on the event loop)
+    date_titles = OrderedDict()
+    
+    async def load_date_titles(datestring):
+        """Return the TitlePages for a date, with at least its first page loaded."""
+        pages = date_titles.get(datestring)
+        if pages is None:
+            pages = TitlePages(
+                lambda after_id, limit: db.fetch_story_titles_page(db_config, datestring, after_id, limit, use_sqlite),
+                0
+            )
+            # The count and the first page are independent queries
+            pages.total, _ = await asyncio.gather(
+                db.count_story_titles(db_config, datestring, use_sqlite),
+                pages.load(PAGE_SIZE)
+            )
+            date_titles[datestring] = pages
+            while len(date_titles) > DATE_TITLES_LIMIT:
+                _, evicted = date_titles.popitem(last=False)
+                evicted.cancel()
+        return pages
+    
+    def get_date_titles(datestring):
+        return run_async(load_date_titles(datestring))
+    
+    # Load only titles initially (lazy loading); more pages load as the list scrolls
+    titles = get_date_titles(default_datestring)
+    story_ids = titles.ids  # Loaded prefix, grows with titles
+    # Loaded story content ({'title': ..., 'content': ...}), LRU-bounded by size and kept across dates
+    story_cache = StoryCache()
+    
+    # Warm story_cache around the highlighted row, and date_titles for the neighbouring days
+    prefetcher = Prefetcher(
+        story_cache,
+        lambda ids: db.fetch_story_contents(db_config, ids, use_sqlite),
+        load_date_titles
+    )
+    
+    def prefetch_around(row):
+        """display_list callback: prefetch around row in the list currently shown."""
+        dates = []
+        if not knn_results and current_date in all_dates:
+            position = all_dates.index(current_date)
+            dates = [all_dates[i] for i in (position + 1, position - 1) if 0 <= i < len(all_dates)]
+        prefetcher.request(display_story_ids, row, dates)
+    
+    def shown_story_id(row):
+        """Story id at row of the list being shown, loading its page first if needed."""
+        if not knn_results and row >= titles.loaded:
+            run_async(titles.load(row + 1))
+        return display_story_ids[row]
+    
+    def get_story(story_id):
+        """Return one story from story_cache, fetching it on a miss (None if not found)."""
+        story_data = story_cache.get(story_id)
+        if story_data is None:
+            story_data = run_async(db.fetch_story_content(db_config, story_id, use_sqlite))
+            if story_data:
+                story_cache.put(story_id, story_data)
+        return story_data
+    
+    def load_stories(ids):
+        """Return {story_id: story} for ids, fetching the ones not in story_cache in one query."""
+        stories = {}
+        for sid in ids:
+            story_data = story_cache.get(sid)
+            if story_data is not None:
+                stories[sid] = story_data
+        missing = [sid for sid in ids if sid not in stories]
+        if missing:
+            fetched = run_async(db.fetch_story_contents(db_config, missing, use_sqlite))
+            story_cache.update(fetched)
+            stories.update(fetched)
+        return stories
+    
+    def lookup_titles(ids):
+        """Titles for ids as {story_id: title}, from story_cache or a titles-only query."""
+        found = {}
+        for sid in ids:
+            story_data = story_cache.peek(sid)
+            if story_data is not None:
+                found[sid] = story_data['title']
+        missing = [sid for sid in ids if sid not in found]
+        if missing:
+            found.update(run_async(db.fetch_titles_by_ids(db_config, missing, use_sqlite)))
+        return found
+    
+    # Where :k ranks stories: inside the database (pgvector / sqlite-vec), or
+    # over embeddings loaded into this process. SQLite uses sqlite-vec only
+    # if `main.py batch index` has filled its table and this Python can load it.
+    if use_sqlite:
+        knn_in_database = run_async(db.has_sqlite_vectors(db_config))
+    else:
+        knn_in_database = knn_mode == "server"
     
     # Background loading of embeddings
-    # Store all embeddings in memory: {story_id: [float, ...]}
-    all_embeddings = {}
+    # Store all embeddings in one contiguous matrix for vectorized KNN
+    embedding_store = EmbeddingStore()
     embeddings_ready = threading.Event()
-    embedding_thread = None
+    embedding_job = None
+    embedding_cache = EmbeddingCache.for_source(db_config)
+    embedding_progress = {'loaded': 0, 'total': 0}
+    
+    def report_progress(loaded, total):
+        embedding_progress['loaded'] = loaded
+        embedding_progress['total'] = total
+    
+    def append_to_cache(batch_ids, batch_vectors):
+        embedding_cache.write(batch_ids, batch_vectors)
+        embedding_cache.load_into(embedding_store, appended=True)
     
-    def load_embeddings_background():
-        """Background thread function to load embeddings."""
+    async def load_embeddings_background():
+        """Background task to refresh embeddings.
+        
+        Only stories newer than the cached max id are streamed; each batch is
+        appended to the on-disk cache and the store is re-mapped from it, so
+        KNN can use the rows loaded so far.
+        """
         try:
-            loaded_embeddings = fetch_all_story_embeddings(db_config, use_sqlite)
-            all_embeddings.update(loaded_embeddings)
+            use_cache = True
+            async for batch_ids, batch_vectors in db.stream_story_embeddings(
+                    db_config, use_sqlite, min_id=embedding_cache.max_id, progress=report_progress):
+                if use_cache:
+                    try:
+                        # File writes off the loop, so queries keep flowing meanwhile
+                        await asyncio.to_thread(append_to_cache, batch_ids, batch_vectors)
+                        continue
+                    except OSError:
+                        # Cache directory not writable: keep new rows in memory only
+                        use_cache = False
+                embedding_store.add(batch_ids, batch_vectors)
         except Exception as e:
-            # If loading fails, embeddings dict remains empty
+            # If loading fails, the embedding store remains empty
             pass
         finally:
             embeddings_ready.set()
+        if use_ann:
+            # Have the IVF index ready before the first :k
+            try:
+                await asyncio.to_thread(get_ann_index)
+            except Exception:
+                pass  # knn_search retries and reports the failure
     
-    if not use_sqlite:
-        # Start background thread to fetch embeddings
-        embedding_thread = threading.Thread(target=load_embeddings_background, daemon=True)
-        embedding_thread.start()
-    else:
-        # In SQLite mode, embeddings are not available, so mark as ready immediately
+    ann_state = {'index': None}
+    ann_lock = threading.Lock()
+    
+    def get_ann_index():
+        """Load or build the IVF index over the current embeddings (kept for the session)."""
+        with ann_lock:
+            index = ann_state['index']
+            if index is None or not index.covers(embedding_store):
+                index = load_or_build_index(embedding_store, embedding_cache.cache_dir,
+                                            n_lists=ann_lists, n_probe=ann_probes)
+                ann_state['index'] = index
+            return index
+    
+    def knn_search_in_database(query_story_id, cmd):
+        """Run a KNN command inside the database (pgvector or sqlite-vec).
+        
+        Ids, titles and scores come back in one query, with no embeddings loaded here.
+        """
+        k, _ = parse_knn_command(cmd)
+        stdscr.clear()
+        stdscr.addstr(0, 2, f"Searching for {k} similar stories...", curses.A_BOLD)
+        stdscr.refresh()
+        try:
+            similar_stories = run_async(db.fetch_similar_stories(db_config, query_story_id, k, use_sqlite=use_sqlite))
+        except Exception as e:
+            show_message(stdscr, f"KNN search failed: {e}".splitlines()[0])
+            return None
+        if not similar_stories:
+            if use_sqlite:
+                show_message(stdscr, "No similar stories found; stories added since the last "
+                                     "'python main.py batch index' are not in the vector table yet.")
+            else:
+                show_message(stdscr, "No similar stories found.")
+            return None
+        source_title = lookup_titles([query_story_id]).get(query_story_id, f"Story {query_story_id}")
+        return {
+            'story_ids': [sid for sid, _, _ in similar_stories],
+            'titles': [title for _, title, _ in similar_stories],
+            'source_story_id': query_story_id,
+            'source_title': source_title,
+            'label': f"KNN Results - {source_title}"
+        }
+    
+    # Precomputed neighbour lists (story_neighbors, filled by `main.py batch neighbors`);
+    # top_n stays 0 until the background check finds the table
+    neighbors_state = {'top_n': 0}
+    
+    async def load_neighbors_state():
+        try:
+            state = await db.fetch_neighbors_state(db_config, use_sqlite)
+        except Exception:
+            return  # No table or no access: every :k runs a live search
+        if state is not None:
+            neighbors_state['top_n'] = state[0]
+    
+    def knn_search_precomputed(query_story_id, cmd):
+        """Answer a plain :k<N> from story_neighbors when N is within its top_n.
+        
+        Returns:
+            knn_results dict, or None if the live search should run instead
+            (an explicit :ka/:ke, k too large, or the story not precomputed yet)
+        """
+        if cmd[1:].strip()[:1] in ("a", "A", "e", "E"):
+            return None
+        k, _ = parse_knn_command(cmd)
+        if k > neighbors_state['top_n']:
+            return None
+        try:
+            neighbours = run_async(db.fetch_precomputed_neighbors(db_config, query_story_id, k, use_sqlite))
+        except Exception:
+            return None
+        if not neighbours:
+            return None
+        source_title = lookup_titles([query_story_id]).get(query_story_id, f"Story {query_story_id}")
+        return {
+            'story_ids': [sid for sid, _, _ in neighbours],
+            'titles': [title for _, title, _ in neighbours],
+            'source_story_id': query_story_id,
+            'source_title': source_title,
+            'label': f"KNN Results - {source_title}"
+        }
+    
+    def knn_search(query_story_id, cmd):
+        """Run a KNN command for one story.
+        
+        A plain :k<N> is read from the precomputed story_neighbors table when
+        N is within its top_n. Local searches run on a worker thread over the
+        embeddings loaded so far; partial results are shown and refined while
+        the rest stream in. ESC cancels, ENTER takes the partial results.
+        
+        Returns:
+            knn_results dict, or None after telling the user why there are no results
+        """
+        precomputed = knn_search_precomputed(query_story_id, cmd)
+        if precomputed is not None:
+            return precomputed
+        if knn_in_database:
+            return knn_search_in_database(query_story_id, cmd)
+        k, approximate = parse_knn_command(cmd, use_ann)
+        search = {'results': [], 'titles': {}, 'rows_searched': 0, 'done': False, 'error': None}
+        search_lock = threading.Lock()
+        cancelled = threading.Event()
+        
+        def publish(results, rows_searched, done=False):
+            # Titles only; content is loaded when a story is opened
+            with search_lock:
+                known = search['titles']
+            missing = [sid for sid, _ in results if sid not in known] + [query_story_id]
+            titles = dict(known)
+            titles.update(lookup_titles(missing))
+            with search_lock:
+                search.update(results=results, titles=titles, rows_searched=rows_searched, done=done)
+        
+        def run_search():
+            """Worker thread: search what is loaded now, then refine as embeddings arrive."""
+            try:
+                query_embedding = embedding_store.get(query_story_id)
+                if query_embedding is None:
+                    # Not streamed in yet (or never embedded): ask the database for it directly
+                    query_embedding = run_async(db.fetch_story_embedding(db_config, query_story_id, use_sqlite))
+                if query_embedding is None:
+                    search['error'] = "No embedding available for this story."
+                    return
+                if approximate and embeddings_ready.is_set():
+                    results = get_ann_index().find_k_most_similar(
+                        embedding_store,
+                        query_embedding,
+                        k=k,
+                        exclude_query_id=query_story_id
+                    )
+                    publish(results, len(embedding_store), done=True)
+                    return
+                # Exact search; while embeddings are loading this also covers :ka
+                knn = IncrementalKNN(embedding_store, query_embedding, k=k, exclude_query_id=query_story_id)
+                while not cancelled.is_set():
+                    finished = embeddings_ready.is_set()  # checked first so the last pass sees every row
+                    if knn.update() or finished:
+                        publish(knn.results, knn.rows_searched, done=finished)
+                    if finished:
+                        return
+                    cancelled.wait(0.25)
+            except Exception as e:
+                search['error'] = f"KNN search failed: {e}".splitlines()[0]
+        
+        worker = threading.Thread(target=run_search, daemon=True)
+        worker.start()
+        stdscr.timeout(100)  # poll for ESC/ENTER while the worker runs
+        try:
+            while True:
+                with search_lock:
+                    results, titles = search['results'], search['titles']
+                    rows_searched, done = search['rows_searched'], search['done']
+                if done or search['error']:
+                    break
+                draw_knn_progress(
+                    stdscr, k, approximate and embeddings_ready.is_set(), rows_searched,
+                    None if embeddings_ready.is_set() else embedding_progress,
+                    [titles.get(sid, f"Story {sid}") for sid, _ in results]
+                )
+                key = stdscr.getch()
+                if key == 27:
+                    cancelled.set()
+                    return None
+                if key in (curses.KEY_ENTER, 10, 13) and results:
+                    cancelled.set()  # keep the partial results
+                    break
+        finally:
+            stdscr.timeout(-1)
+        
+        if search['error']:
+            show_message(stdscr, search['error'])
+            return None
+        if not results:
+            if embeddings_ready.is_set() and len(embedding_store) == 0:
+                # Embeddings failed to load
+                show_message(stdscr, "Error: Could not load embeddings.")
+            else:
+                show_message(stdscr, "No similar stories found.")
+            return None
+        
+        # Build results list
+        knn_story_ids = [sid for sid, _ in results]
+        source_title = titles.get(query_story_id, f"Story {query_story_id}")
+        return {
+            'story_ids': knn_story_ids,
+            'titles': [titles.get(sid, f"Story {sid}") for sid in knn_story_ids],
+            'source_story_id': query_story_id,
+            'source_title': source_title,
+            'label': f"KNN Results - {source_title}"
+        }
+    
+    def search_command(cmd):
+        """Run a ":s <query>" full-text search over every date.
+        
+        Needs the full-text index made by `main.py batch index`; without it
+        the user is told so instead of waiting on a scan of every story.
+        
+        Returns:
+            Results dict in the same shape as knn_search's, or None after
+            telling the user why there are no results
+        """
+        query = cmd[1:].strip()
+        if not query:
+            show_message(stdscr, "Usage: :s <search terms>")
+            return None
+        stdscr.clear()
+        stdscr.addstr(0, 2, f"Searching for {query}...", curses.A_BOLD)
+        stdscr.refresh()
+        try:
+            found = run_async(db.search_stories(db_config, query, use_sqlite=use_sqlite))
+        except SearchIndexMissing as e:
+            show_message(stdscr, str(e))
+            return None
+        except Exception as e:
+            show_message(stdscr, f"Search failed: {e}".splitlines()[0])
+            return None
+        if not found:
+            show_message(stdscr, f"No stories found for {query}.")
+            return None
+        return {
+            'story_ids': [sid for sid, _ in found],
+            'titles': [title for _, title in found],
+            'source_story_id': None,
+            'source_title': query,
+            'label': f"Search Results - {query}"
+        }
+    
+    def hybrid_command(query_story_id, cmd):
+        """Run a ":h [dates] <query>" search: stories like query_story_id that match the query.
+        
+        Returns:
+            Results dict in the same shape as knn_search's, or None after
+            telling the user why there are no results
+        """
+        query, date_range = parse_hybrid_command(cmd)
+        stdscr.clear()
+        stdscr.addstr(0, 2, "Searching for similar stories" + (f" mentioning {query}..." if query else "..."),
+                      curses.A_BOLD)
+        stdscr.refresh()
+        # Local KNN mode scores the loaded embeddings here; otherwise the database ranks them
+        store = None if knn_in_database else embedding_store
+        try:
+            fused = run_async(hybrid_search(db_config, query, query_story_id, store, k=20,
+                                            date_range=date_range, use_sqlite=use_sqlite))
+        except Exception as e:
+            show_message(stdscr, f"Hybrid search failed: {e}".splitlines()[0])
+            return None
+        if not fused:
+            show_message(stdscr, "No stories found.")
+            return None
+        result_ids = [sid for sid, _ in fused]
+        titles = lookup_titles(result_ids + [query_story_id])
+        source_title = titles.get(query_story_id, f"Story {query_story_id}")
+        label = f"Hybrid Results - {source_title}"
+        if query:
+            label += f" + {query}"
+        if date_range is not None:
+            label += f" ({date_range[0]}-{date_range[1]})"
+        return {
+            'story_ids': result_ids,
+            'titles': [titles.get(sid, f"Story {sid}") for sid in result_ids],
+            'source_story_id': query_story_id,
+            'source_title': source_title,
+            'label': label
+        }
+    
+    if knn_in_database:
+        # KNN inside the database never needs the embeddings on this machine
         embeddings_ready.set()
+    else:
+        if rebuild_embedding_cache:
+            embedding_cache.clear()
+        # Memory-map cached embeddings so KNN works right away
+        embedding_cache.load_into(embedding_store)
+        # Fetch new embeddings in the background
+        embedding_job = submit_async(load_embeddings_background())
+    
+    async def refresh_dates_background():
+        global all_dates
+        try:
+            new_counts, max_id = await db.fetch_date_counts(db_config, use_sqlite, date_summary.max_id)
+            if date_summary.merge(new_counts, max_id):
+                all_dates = date_summary.dates
+        except Exception:
+            pass  # Keep the cached dates; the next start tries again
+    
+    dates_job = submit_async(refresh_dates_background()) if summary_was_cached else None
+    neighbors_job = submit_async(load_neighbors_state())
     
     current_date = default_datestring
     selected_index = 0
     
-    # Track KNN results: None means normal view, otherwise dict with 'story_ids', 'titles', 'source_story_id'
+    # Track KNN/search results: None means normal view, otherwise dict with
+    # 'story_ids', 'titles', 'source_story_id', 'source_title', 'label'
     knn_results = None
 
     while True:
@@ -87,30 +539,17 @@ def tui(stdscr, db_config, default_datestring, use_sqlite=True):
         display_titles = knn_results['titles'] if knn_results else titles
         display_story_ids = knn_results['story_ids'] if knn_results else story_ids
         if knn_results:
-            # Get the title of the source story used for the search
-            source_story_id = knn_results['source_story_id']
-            if source_story_id in story_cache:
-                source_title = story_cache[source_story_id]['title']
-            else:
-                # Fallback: try to fetch it (shouldn't happen, but handle gracefully)
-                source_story_data = fetch_story_content(db_config, source_story_id, use_sqlite)
-                if source_story_data:
-                    story_cache[source_story_id] = source_story_data
-                    source_title = source_story_data['title']
-                else:
-                    source_title = f"Story {source_story_id}"
-            display_date = f"KNN Results - {source_title}"
+            display_date = knn_results['label']
         else:
             display_date = current_date
         
-        list_result = display_list(stdscr, display_titles, display_date, selected_index)
+        list_result = display_list(stdscr, display_titles, display_date, selected_index, on_select=prefetch_around)
         if list_result is None:
             if knn_results:
                 # Return to normal view from KNN results
                 knn_results = None
-                story_list = fetch_story_titles(db_config, current_date, use_sqlite)
-                titles = [title for _, title in story_list]
-                story_ids = [story_id for story_id, _ in story_list]
+                titles = get_date_titles(current_date)
+                story_ids = titles.ids
                 selected_index = 0
                 continue
             else:
@@ -122,138 +561,52 @@ def tui(stdscr, db_config, default_datestring, use_sqlite=True):
                 cmd = list_result[1].strip()
                 selected_index = list_result[2]
                 if cmd.startswith("k") or cmd.startswith("K"):
-                    # KNN search command: k <number> or k<number>
-                    if not use_sqlite:
-                        # Wait for embeddings if they're not ready yet
-                        if not wait_for_embeddings(stdscr, embeddings_ready, all_embeddings):
-                            # Embeddings failed to load or timed out
-                            stdscr.clear()
-                            stdscr.addstr(0, 2, "Error: Could not load embeddings.", curses.A_BOLD)
-                            stdscr.addstr(2, 2, "Press any key to continue...")
-                            stdscr.refresh()
-                            stdscr.getch()
-                            continue
-                        
-                        # Parse the number
-                        cmd_parts = cmd.split()
-                        if len(cmd_parts) == 1:
-                            # Try to extract number from command like "k5"
-                            num_str = cmd[1:].strip()
-                            if not num_str:
-                                k = 5  # Default
-                            else:
-                                try:
-                                    k = int(num_str)
-                                except ValueError:
-                                    k = 5
-                        else:
-                            try:
-                                k = int(cmd_parts[1])
-                            except (ValueError, IndexError):
-                                k = 5
-                        
-                        # Get the selected story ID
-                        query_story_id = display_story_ids[selected_index]
-                        query_embedding = all_embeddings.get(query_story_id)
-                        
-                        if query_embedding:
-                            # Show searching message
-                            stdscr.clear()
-                            stdscr.addstr(0, 2, f"Searching for {k} similar stories...", curses.A_BOLD)
-                            stdscr.refresh()
-                            
-                            # Get all candidate story IDs (all stories with embeddings)
-                            candidate_ids = list(all_embeddings.keys())
-                            
-                            # Perform KNN search
-                            similar_stories = find_k_most_similar(
-                                query_embedding,
-                                all_embeddings,
-                                candidate_ids,
-                                k=k,
-                                exclude_query_id=query_story_id
-                            )
-                            
-                            if similar_stories:
-                                # Build results list
-                                knn_story_ids = [sid for sid, _ in similar_stories]
-                                knn_titles = []
-                                for sid in knn_story_ids:
-                                    # Try to get title from cache or fetch it
-                                    if sid in story_cache:
-                                        knn_titles.append(story_cache[sid]['title'])
-                                    else:
-                                        story_data = fetch_story_content(db_config, sid, use_sqlite)
-                                        if story_data:
-                                            story_cache[sid] = story_data
-                                            knn_titles.append(story_data['title'])
-                                        else:
-                                            knn_titles.append(f"Story {sid}")
-                                
-                                knn_results = {
-                                    'story_ids': knn_story_ids,
-                                    'titles': knn_titles,
-                                    'source_story_id': query_story_id
-                                }
-                                selected_index = 0
-                            else:
-                                # No results found
-                                stdscr.clear()
-                                stdscr.addstr(0, 2, "No similar stories found.", curses.A_BOLD)
-                                stdscr.addstr(2, 2, "Press any key to continue...")
-                                stdscr.refresh()
-                                stdscr.getch()
-                        else:
-                            # No embedding for this story
-                            stdscr.clear()
-                            stdscr.addstr(0, 2, "No embedding available for this story.", curses.A_BOLD)
-                            stdscr.addstr(2, 2, "Press any key to continue...")
-                            stdscr.refresh()
-                            stdscr.getch()
-                    else:
-                        # SQLite mode or no embeddings
-                        stdscr.clear()
-                        stdscr.addstr(0, 2, "KNN search only available with PostgreSQL embeddings.", curses.A_BOLD)
-                        stdscr.addstr(2, 2, "Press any key to continue...")
-                        stdscr.refresh()
-                        stdscr.getch()
+                    # KNN search command: k <number> or k<number> (ka/ke force approximate/exact)
+                    result = knn_search(shown_story_id(selected_index), cmd)
+                    if result:
+                        knn_results = result
+                        selected_index = 0
+                elif cmd.startswith("s"):
+                    # Full-text search across all dates: s <query>
+                    result = search_command(cmd)
+                    if result:
+                        knn_results = result
+                        selected_index = 0
+                elif cmd.startswith("h"):
+                    # Hybrid search around the highlighted story: h [YYYYMMDD-YYYYMMDD] <query>
+                    result = hybrid_command(shown_story_id(selected_index), cmd)
+                    if result:
+                        knn_results = result
+                        selected_index = 0
                 elif cmd.startswith("d"):
                     parts = cmd.split()
                     if len(parts) < 2 or parts[1] not in all_dates:
-                        chosen = display_dates_popup(stdscr, all_dates, current_date)
+                        chosen = display_dates_popup(stdscr, all_dates, current_date, date_summary.counts)
                         if chosen is not None:
                             current_date = chosen
-                            story_list = fetch_story_titles(db_config, chosen, use_sqlite)
-                            titles = [title for _, title in story_list]
-                            story_ids = [story_id for story_id, _ in story_list]
-                            story_cache = {}  # Clear cache when changing dates
+                            titles = get_date_titles(chosen)
+                            story_ids = titles.ids
                             knn_results = None  # Clear KNN results
                             selected_index = 0
                     else:
                         new_date = parts[1]
                         current_date = new_date
-                        story_list = fetch_story_titles(db_config, new_date, use_sqlite)
-                        titles = [title for _, title in story_list]
-                        story_ids = [story_id for story_id, _ in story_list]
-                        story_cache = {}  # Clear cache when changing dates
+                        titles = get_date_titles(new_date)
+                        story_ids = titles.ids
                         knn_results = None  # Clear KNN results
                         selected_index = 0
                 elif cmd.startswith("c"):
                     # If user typed just ":c"
                     if len(cmd.split()) == 1:
                         cmd = f"c {selected_index + 1}"
-                    # For copy command, we need to load stories if not cached
-                    stories = []
-                    for story_id in display_story_ids:
-                        if story_id in story_cache:
-                            stories.append(story_cache[story_id]['content'])
-                        else:
-                            story_data = fetch_story_content(db_config, story_id, use_sqlite)
-                            if story_data:
-                                story_cache[story_id] = story_data
-                                stories.append(story_data['content'])
-                            else:
-                                stories.append("")
+                    # For copy command, we need every title and to load stories if not cached
+                    if not knn_results:
+                        run_async(titles.load_all())
+                    loaded = load_stories(display_story_ids)
+                    stories = [
+                        loaded[story_id]['content'] if story_id in loaded else ""
+                        for story_id in display_story_ids
+                    ]
                     copy_stories(stdscr, cmd, stories, display_titles)
                 elif cmd.isdigit():
                     # If user typed just a number
@@ -263,20 +616,17 @@ def tui(stdscr, db_config, default_datestring, use_sqlite=True):
                     elif selected_index < 0:
                         selected_index = 0
                     # Load story content if not cached
-                    story_id = display_story_ids[selected_index]
-                    if story_id not in story_cache:
-                        story_data = fetch_story_content(db_config, story_id, use_sqlite)
-                        if story_data:
-                            story_cache[story_id] = story_data
-                    if story_id in story_cache:
-                        story_data = story_cache[story_id]
+                    story_id = shown_story_id(selected_index)
+                    story_data = get_story(story_id)
+                    if story_data:
                         display_story(
                             stdscr,
                             story_data['title'],
                             story_data['content'],
                             selected_index,
                             story_data.get('issue_date', current_date),
-                            knn_results=knn_results
+                            knn_results=knn_results,
+                            story_id=story_id
                         )
 
             continue
@@ -286,17 +636,11 @@ def tui(stdscr, db_config, default_datestring, use_sqlite=True):
             story_offset = 0
             
             # Load story content if not cached
-            story_id = display_story_ids[selected_index]
-            if story_id not in story_cache:
-                story_data = fetch_story_content(db_config, story_id, use_sqlite)
-                if story_data:
-                    story_cache[story_id] = story_data
-            
-            if story_id not in story_cache:
+            story_id = shown_story_id(selected_index)
+            story_data = get_story(story_id)
+            if story_data is None:
                 # Story not found, skip
                 continue
-            
-            story_data = story_cache[story_id]
 
             while True:
                 story_result = display_story(
@@ -306,7 +650,8 @@ def tui(stdscr, db_config, default_datestring, use_sqlite=True):
                     selected_index,
                     story_data.get('issue_date', current_date),
                     offset=story_offset,
-                    knn_results=knn_results
+                    knn_results=knn_results,
+                    story_id=story_id
                 )
 
                 if story_result == "exit":
@@ -319,140 +664,56 @@ def tui(stdscr, db_config, default_datestring, use_sqlite=True):
                     cmd = story_result[1].strip()
                     story_offset = story_result[2]  # preserve scroll
                     if cmd.startswith("k") or cmd.startswith("K"):
-                        # KNN search command from story view
-                        if not use_sqlite:
-                            # Wait for embeddings if they're not ready yet
-                            if not wait_for_embeddings(stdscr, embeddings_ready, all_embeddings):
-                                # Embeddings failed to load or timed out
-                                stdscr.clear()
-                                stdscr.addstr(0, 2, "Error: Could not load embeddings.", curses.A_BOLD)
-                                stdscr.addstr(2, 2, "Press any key to continue...")
-                                stdscr.refresh()
-                                stdscr.getch()
-                                continue
-                            
-                            # Parse the number
-                            cmd_parts = cmd.split()
-                            if len(cmd_parts) == 1:
-                                num_str = cmd[1:].strip()
-                                if not num_str:
-                                    k = 5
-                                else:
-                                    try:
-                                        k = int(num_str)
-                                    except ValueError:
-                                        k = 5
-                            else:
-                                try:
-                                    k = int(cmd_parts[1])
-                                except (ValueError, IndexError):
-                                    k = 5
-                            
-                            # Use current story as query
-                            query_story_id = story_id
-                            query_embedding = all_embeddings.get(query_story_id)
-                            
-                            if query_embedding:
-                                # Show searching message
-                                stdscr.clear()
-                                stdscr.addstr(0, 2, f"Searching for {k} similar stories...", curses.A_BOLD)
-                                stdscr.refresh()
-                                
-                                # Get all candidate story IDs
-                                candidate_ids = list(all_embeddings.keys())
-                                
-                                # Perform KNN search
-                                similar_stories = find_k_most_similar(
-                                    query_embedding,
-                                    all_embeddings,
-                                    candidate_ids,
-                                    k=k,
-                                    exclude_query_id=query_story_id
-                                )
-                                
-                                if similar_stories:
-                                    # Build results list
-                                    knn_story_ids = [sid for sid, _ in similar_stories]
-                                    knn_titles = []
-                                    for sid in knn_story_ids:
-                                        if sid in story_cache:
-                                            knn_titles.append(story_cache[sid]['title'])
-                                        else:
-                                            story_data_fetch = fetch_story_content(db_config, sid, use_sqlite)
-                                            if story_data_fetch:
-                                                story_cache[sid] = story_data_fetch
-                                                knn_titles.append(story_data_fetch['title'])
-                                            else:
-                                                knn_titles.append(f"Story {sid}")
-                                    
-                                    knn_results = {
-                                        'story_ids': knn_story_ids,
-                                        'titles': knn_titles,
-                                        'source_story_id': query_story_id
-                                    }
-                                    selected_index = 0
-                                    break  # Exit story view to show KNN results
-                                else:
-                                    # No results found
-                                    stdscr.clear()
-                                    stdscr.addstr(0, 2, "No similar stories found.", curses.A_BOLD)
-                                    stdscr.addstr(2, 2, "Press any key to continue...")
-                                    stdscr.refresh()
-                                    stdscr.getch()
-                            else:
-                                # No embedding for this story
-                                stdscr.clear()
-                                stdscr.addstr(0, 2, "No embedding available for this story.", curses.A_BOLD)
-                                stdscr.addstr(2, 2, "Press any key to continue...")
-                                stdscr.refresh()
-                                stdscr.getch()
-                        else:
-                            # SQLite mode or no embeddings
-                            stdscr.clear()
-                            stdscr.addstr(0, 2, "KNN search only available with PostgreSQL embeddings.", curses.A_BOLD)
-                            stdscr.addstr(2, 2, "Press any key to continue...")
-                            stdscr.refresh()
-                            stdscr.getch()
+                        # KNN search command from story view, using the current story as query
+                        result = knn_search(story_id, cmd)
+                        if result:
+                            knn_results = result
+                            selected_index = 0
+                            break  # Exit story view to show KNN results
+                    elif cmd.startswith("s"):
+                        result = search_command(cmd)
+                        if result:
+                            knn_results = result
+                            selected_index = 0
+                            break  # Exit story view to show the search results
+                    elif cmd.startswith("h"):
+                        result = hybrid_command(story_id, cmd)
+                        if result:
+                            knn_results = result
+                            selected_index = 0
+                            break  # Exit story view to show the search results
                     elif cmd.startswith("d"):
                         parts = cmd.split()
                         if len(parts) < 2 or parts[1] not in all_dates:
-                            chosen = display_dates_popup(stdscr, all_dates, current_date)
+                            chosen = display_dates_popup(stdscr, all_dates, current_date, date_summary.counts)
                             if chosen is not None:
                                 current_date = chosen
-                                story_list = fetch_story_titles(db_config, chosen, use_sqlite)
-                                titles = [title for _, title in story_list]
-                                story_ids = [story_id for story_id, _ in story_list]
-                                story_cache = {}  # Clear cache when changing dates
+                                titles = get_date_titles(chosen)
+                                story_ids = titles.ids
                                 knn_results = None  # Clear KNN results
                                 selected_index = 0
                             break
                         else:
                             new_date = parts[1]
                             current_date = new_date
-                            story_list = fetch_story_titles(db_config, new_date, use_sqlite)
-                            titles = [title for _, title in story_list]
-                            story_ids = [story_id for story_id, _ in story_list]
-                            story_cache = {}  # Clear cache when changing dates
+                            titles = get_date_titles(new_date)
+                            story_ids = titles.ids
                             knn_results = None  # Clear KNN results
                             selected_index = 0
                             break
                     elif cmd.startswith("c"):
                         if len(cmd.split()) == 1:
                             cmd = f"c {selected_index + 1}"
-                        # For copy command, we need to load stories if not cached
-                        stories = []
+                        # For copy command, we need every title and to load stories if not cached
+                        if not knn_results:
+                            run_async(titles.load_all())
                         current_story_ids = knn_results['story_ids'] if knn_results else story_ids
                         current_titles = knn_results['titles'] if knn_results else titles
-                        for sid in current_story_ids:
-                            if sid in story_cache:
-                                stories.append(story_cache[sid]['content'])
-                            else:
-                                story_data_fetch = fetch_story_content(db_config, sid, use_sqlite)
-                                if story_data_fetch:
-                                    story_cache[sid] = story_data_fetch
-                                    stories.append(story_data_fetch['content'])
-                                else:
-                                    stories.append("")
+                        loaded = load_stories(current_story_ids)
+                        stories = [
+                            loaded[sid]['content'] if sid in loaded else ""
+                            for sid in current_story_ids
+                        ]
                         copy_stories(stdscr, cmd, stories, current_titles)
                         # do not reset offset - remain in story
                     else:
@@ -461,18 +722,55 @@ def tui(stdscr, db_config, default_datestring, use_sqlite=True):
                 else:
                     # user pressed ESC or something else
                     break
+    
+    prefetcher.cancel()
+    if embedding_job is not None:
+        embedding_job.cancel()
+    if dates_job is not None:
+        dates_job.cancel()
+    neighbors_job.cancel()
 
-def main(datestring, db_config, use_sqlite=True):
+def main(datestring, db_config, use_sqlite=True, rebuild_embedding_cache=False, use_ann=False, knn_mode="local",
+         rebuild_date_index=False, ann_lists=None, ann_probes=None):
+    import curses
     try:
-        curses.wrapper(lambda stdscr: tui(stdscr, db_config, datestring, use_sqlite))
+        curses.wrapper(lambda stdscr: tui(stdscr, db_config, datestring, use_sqlite, rebuild_embedding_cache,
+                                          use_ann, knn_mode, rebuild_date_index, ann_lists, ann_probes))
     finally:
-        # Clean up database connection on exit
+        # Clean up database connections on exit
+        close_async_database()
         close_db_connection()
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description='News Story Reader')
+    if sys.argv[1:2] == ["batch"]:
+        # Headless subcommand (bulk KNN / export); see batch.py
+        import batch
+        load_dotenv()
+        sys.exit(batch.main(sys.argv[2:]))
+    
+    parser = argparse.ArgumentParser(
+        description='News Story Reader',
+        epilog='"main.py batch --help" lists the headless batch jobs (search index, bulk KNN, related-story precompute, export as JSONL/CSV).'
+    )
     parser.add_argument('datestring', nargs='?', help='Date string in YYYYMMDD format')
     parser.add_argument('--sqlite', action='store_true', help='Use SQLite database instead of PostgreSQL')
+    parser.add_argument('--rebuild-embedding-cache', action='store_true',
+                        help='Discard the local embedding cache and reload every embedding from the database')
+    parser.add_argument('--rebuild-date-index', action='store_true',
+                        help='Recount the stories per date instead of updating the local date index '
+                             '(needed after stories are deleted or re-dated)')
+    parser.add_argument('--ann', action='store_true',
+                        help='Use the approximate (IVF) index for :k searches; :ke<N> still searches exactly')
+    parser.add_argument('--ann-lists', type=int, default=None, metavar='N',
+                        help='Number of IVF lists; changing it rebuilds the index '
+                             '(default: ANN_LISTS from .env, else about 4 * sqrt(stories))')
+    parser.add_argument('--ann-probes', type=int, default=None, metavar='N',
+                        help='IVF lists searched per approximate query (default: ANN_PROBES from .env, '
+                             'else the fewest reaching recall 0.95, measured when the index is built)')
+    parser.add_argument('--knn', choices=['local', 'server'], default=None,
+                        help='Where :k ranks stories: "local" loads embeddings into this process, '
+                             '"server" asks PostgreSQL/pgvector, indexed by "main.py batch index" '
+                             '(default: KNN_MODE from .env, else local)')
     args = parser.parse_args()
     
     # Determine datestring
@@ -486,34 +784,27 @@ if __name__ == "__main__":
     
     # Determine database configuration
     use_sqlite = args.sqlite
+    db_config = db_config_from_env(use_sqlite)
+    if db_config is None:
+        print("Error: POSTGRES_DB and POSTGRES_USER must be set in .env file for PostgreSQL mode")
+        sys.exit(1)
     
-    if use_sqlite:
-        # SQLite mode: use STORY_DB_DIR or default to news.db
-        db_config = os.getenv("STORY_DB_DIR", "news.db")
-    else:
-        # PostgreSQL mode: read connection parameters from .env
-        db_config = {}
-        # Only include parameters that are set
-        if os.getenv("POSTGRES_HOST"):
-            db_config['host'] = os.getenv("POSTGRES_HOST")
-        else:
-            db_config['host'] = "localhost"
-        
-        if os.getenv("POSTGRES_PORT"):
-            db_config['port'] = os.getenv("POSTGRES_PORT")
-        else:
-            db_config['port'] = "5432"
-        
-        db_config['database'] = os.getenv("POSTGRES_DB")
-        db_config['user'] = os.getenv("POSTGRES_USER")
-        
-        password = os.getenv("POSTGRES_PASSWORD")
-        if password:
-            db_config['password'] = password
-        
-        # Validate required PostgreSQL parameters
-        if not db_config['database'] or not db_config['user']:
-            print("Error: POSTGRES_DB and POSTGRES_USER must be set in .env file for PostgreSQL mode")
-            sys.exit(1)
+    knn_mode = args.knn or os.getenv("KNN_MODE", "local")
+    if knn_mode not in ("local", "server"):
+        print(f"Error: KNN_MODE must be 'local' or 'server', not {knn_mode!r}")
+        sys.exit(1)
+    
+    ann_settings = {}
+    for name, value in (("ANN_LISTS", args.ann_lists), ("ANN_PROBES", args.ann_probes)):
+        value = value if value is not None else os.getenv(name)
+        if value is not None:
+            try:
+                ann_settings[name] = int(value)
+            except ValueError:
+                ann_settings[name] = 0
+            if ann_settings[name] < 1:
+                print(f"Error: {name} must be a positive integer, not {value!r}")
+                sys.exit(1)
     
-    main(datestring, db_config, use_sqlite)
+    main(datestring, db_config, use_sqlite, args.rebuild_embedding_cache, args.ann, knn_mode,
+         args.rebuild_date_index, ann_settings.get("ANN_LISTS"), ann_settings.get("ANN_PROBES"))
@@ -0,0 +1,98 @@
+# neighbors.py
+# Precomputed related stories: fills the story_neighbors table and keeps it up to date
+
+import numpy as np
+
+import database
+from similarity import BATCH_MEMORY_BYTES
+
+DEFAULT_TOP_N = 20
+WRITE_BLOCK = 2000  # stories whose lists are written per transaction
+
+
+def best_scores_against(store, story_ids, memory_bytes=BATCH_MEMORY_BYTES):
+    """For every row of store, its highest cosine similarity to any of story_ids (other than itself).
+
+    Returns:
+        float32 array aligned with store.snapshot() rows; -inf where nothing scored
+    """
+    ids, matrix, norms = store.snapshot()
+    best = np.full(len(ids), -np.inf, dtype=np.float32)
+    rows = store.rows_of(story_ids, len(ids))
+    rows = rows[rows >= 0]
+    if matrix is None or len(rows) == 0:
+        return best
+    with np.errstate(divide='ignore'):
+        inv_norms = np.where(norms > 0, 1.0 / norms, 0).astype(np.float32)
+    chunk = max(1, memory_bytes // (4 * len(ids)))
+    for start in range(0, len(rows), chunk):
+        batch = rows[start:start + chunk]
+        scores = matrix[batch] @ matrix.T
+        scores *= inv_norms
+        scores *= inv_norms[batch][:, np.newaxis]
+        scores[:, norms == 0] = -np.inf
+        scores[np.arange(len(batch)), batch] = -np.inf
+        np.maximum(best, scores.max(axis=0), out=best)
+    return best
+
+
+def refresh_story_neighbors(db_config, store, top_n=DEFAULT_TOP_N, use_sqlite=True, knn=None, rebuild=False,
+                            memory_bytes=BATCH_MEMORY_BYTES, log=None):
+    """Bring the story_neighbors table up to date with the embeddings in store.
+
+    The first run (or rebuild, or a different top_n) computes the top_n
+    neighbours of every story. Later runs only handle the stories added
+    since: their own lists are computed, and an existing story's list is
+    recomputed only if one of the new stories scores above its current
+    weakest neighbour (or its list is not full yet).
+
+    Args:
+        db_config: If use_sqlite is True, this is the SQLite database file path.
+                   If use_sqlite is False, this is a dict with PostgreSQL connection params.
+        store: EmbeddingStore holding every story embedding
+        top_n: Neighbours kept per story
+        use_sqlite: Boolean indicating whether to use SQLite (True) or PostgreSQL (False)
+        knn: Object with batch_k_most_similar (e.g. a ParallelKNN); defaults to store
+        rebuild: Recompute every story's list
+        memory_bytes: Score matrix budget per chunk of queries
+        log: Optional callable(message) for progress messages
+
+    Returns:
+        Tuple (new_stories, updated_stories): how many lists were written for
+        new stories and recomputed for existing ones
+    """
+    log = log or (lambda message: None)
+    knn = knn or store
+    database.ensure_neighbors_table(db_config, use_sqlite)
+    state = database.fetch_neighbors_state(db_config, use_sqlite)
+    ids = store.snapshot()[0]
+    # With fewer than top_n + 1 stories every list is shorter than top_n
+    full = rebuild or state is None or state[0] != min(top_n, max(len(ids) - 1, 0))
+    if full:
+        new_ids = ids.tolist()
+        updated_ids = []
+        log(f"neighbors: computing top {top_n} for all {len(new_ids)} stories")
+    else:
+        new_ids = ids[ids > state[1]].tolist()
+        updated_ids = []
+        if new_ids:
+            stored_ids, counts, min_scores = database.fetch_neighbor_thresholds(db_config, use_sqlite)
+            best = best_scores_against(store, new_ids, memory_bytes)
+            rows = store.rows_of(stored_ids.tolist(), len(ids))
+            known = rows >= 0
+            threshold = np.where(counts < top_n, -np.inf, min_scores)
+            affected = known & (best[np.maximum(rows, 0)] > threshold)
+            updated_ids = stored_ids[affected].tolist()
+        log(f"neighbors: {len(new_ids)} new stories, {len(updated_ids)} existing lists affected")
+
+    pending = {}
+    first_write = full
+    for story_id, neighbours in knn.batch_k_most_similar(new_ids + updated_ids, top_n, None, memory_bytes):
+        pending[story_id] = neighbours
+        if len(pending) >= WRITE_BLOCK:
+            database.replace_story_neighbors(db_config, pending, use_sqlite, clear=first_write)
+            first_write = False
+            pending = {}
+    if pending or first_write:
+        database.replace_story_neighbors(db_config, pending, use_sqlite, clear=first_write)
+    return len(new_ids), len(updated_ids)
@@ -0,0 +1,238 @@
+# parallel_knn.py
+# Batch KNN sharded across worker processes (shared memory) or threads
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+from similarity import BATCH_MEMORY_BYTES
+
+# Each worker already runs one shard; BLAS threads on top would only oversubscribe the cores
+_BLAS_THREAD_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "VECLIB_MAXIMUM_FRAMEWORK_THREADS")
+
+_worker = {}  # in worker processes: 'matrix', 'norms' and the SharedMemory handles
+
+
+def default_workers():
+    """Worker count used when none is given: the CPUs this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _shard_top_k(matrix, norms, start, end, queries, query_rows, k, allowed=None):
+    """Top-k rows of matrix[start:end] for each (unit-length) query.
+
+    Args:
+        matrix, norms: The full embedding matrix and its row norms
+        start, end: Row range of the shard
+        queries: float32 matrix of query vectors, already divided by their norms
+        query_rows: Row of each query in matrix (-1 if none), excluded from its own results
+        k: Number of rows to keep per query
+        allowed: Optional bool mask over the shard's rows; False rows are never returned
+
+    Returns:
+        Tuple (rows, scores): (queries x k) arrays of global row indices and
+        cosine scores, unsorted; excluded rows score -inf
+    """
+    scores = queries @ matrix[start:end].T
+    shard_norms = norms[start:end]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scores /= shard_norms
+    scores[:, shard_norms == 0] = -np.inf
+    if allowed is not None:
+        scores[:, ~allowed] = -np.inf
+    local = query_rows - start
+    own = (query_rows >= 0) & (local >= 0) & (local < end - start)
+    scores[np.nonzero(own)[0], local[own]] = -np.inf
+    k = min(k, end - start)
+    if k < end - start:
+        top = np.argpartition(scores, -k, axis=1)[:, -k:]
+    else:
+        top = np.broadcast_to(np.arange(end - start), scores.shape)
+    return top + start, np.take_along_axis(scores, top, axis=1)
+
+
+def _init_worker(matrix_name, matrix_shape, norms_name):
+    """Process pool initializer: map the shared matrix and norms without copying them."""
+    matrix_shm = shared_memory.SharedMemory(name=matrix_name)
+    norms_shm = shared_memory.SharedMemory(name=norms_name)
+    _worker['shm'] = (matrix_shm, norms_shm)
+    _worker['matrix'] = np.ndarray(matrix_shape, dtype=np.float32, buffer=matrix_shm.buf)
+    _worker['norms'] = np.ndarray(matrix_shape[0], dtype=np.float32, buffer=norms_shm.buf)
+
+
+def _process_worker_ready(_):
+    return os.getpid()
+
+
+def _process_shard_top_k(start, end, queries, query_rows, k, allowed):
+    return _shard_top_k(_worker['matrix'], _worker['norms'], start, end, queries, query_rows, k, allowed)
+
+
+class ParallelKNN:
+    """Batch KNN over an EmbeddingStore snapshot, split into row shards scored in parallel.
+
+    Every chunk of queries is scored against each shard by a separate
+    worker; each returns its own top-k per query and the shard results are
+    merged into the final top-k. With backend "processes" the matrix and
+    norms are copied once into shared memory that every worker maps, and
+    BLAS in the workers is limited to one thread. With backend "threads"
+    the shards run on a thread pool in this process (numpy releases the GIL
+    during the matrix product), which avoids the copy but shares the cores
+    with BLAS's own threads.
+
+    Rows added to the store after construction are not searched; the store
+    must not be reloaded (remapped) while this is in use. Use as a
+    context manager, or call close(), to stop the workers and free the
+    shared memory.
+
+    Args:
+        store: EmbeddingStore to search
+        workers: Number of shards and workers (default: available CPUs)
+        backend: "processes" or "threads"
+        memory_bytes: Upper bound on the score matrices of one chunk of queries, over all shards
+    """
+
+    def __init__(self, store, workers=None, backend="processes", memory_bytes=BATCH_MEMORY_BYTES):
+        if backend not in ("processes", "threads"):
+            raise ValueError(f"backend must be 'processes' or 'threads', not {backend!r}")
+        self.store = store
+        self.ids, matrix, norms = store.snapshot()
+        self.memory_bytes = memory_bytes
+        self.backend = backend
+        self._shm = []
+        self._pool = None
+        rows = len(self.ids)
+        self.workers = max(1, min(workers or default_workers(), rows or 1))
+        bounds = np.linspace(0, rows, self.workers + 1).astype(int)
+        self.shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        if matrix is None or rows == 0:
+            self.matrix, self.norms = None, None
+            return
+
+        if backend == "threads":
+            self.matrix, self.norms = matrix, norms
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="knn-shard")
+            return
+
+        try:
+            self.matrix = self._share(matrix)
+            self.norms = self._share(norms)
+            saved = {name: os.environ.get(name) for name in _BLAS_THREAD_VARS}
+            os.environ.update({name: "1" for name in _BLAS_THREAD_VARS})
+            try:
+                # spawn: workers start with a fresh BLAS that reads the variables above
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self._shm[0].name, self.matrix.shape, self._shm[1].name)
+                )
+                # Start the workers now, while the variables are set
+                list(self._pool.map(_process_worker_ready, range(self.workers)))
+            finally:
+                for name, value in saved.items():
+                    if value is None:
+                        os.environ.pop(name, None)
+                    else:
+                        os.environ[name] = value
+        except BaseException:
+            self.close()
+            raise
+
+    def _share(self, array):
+        """Copy array into a new shared memory block and return the view on it."""
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        self._shm.append(shm)
+        shared = np.ndarray(array.shape, dtype=np.float32, buffer=shm.buf)
+        shared[...] = array
+        return shared
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        self.matrix = self.norms = None
+        for shm in self._shm:
+            shm.close()
+            shm.unlink()
+        self._shm = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def batch_k_most_similar(self, query_ids, k=5, candidate_ids=None, memory_bytes=None):
+        """Same results as EmbeddingStore.batch_k_most_similar, computed by the workers.
+
+        Args:
+            query_ids: Story IDs to find neighbours for; ids without an
+                       embedding in the store are skipped
+            k: Number of most similar stories per query
+            candidate_ids: Optional iterable of story IDs to restrict the search to
+                           (the other rows are still scored, then masked out)
+            memory_bytes: Overrides the memory_bytes given to the constructor
+
+        Yields:
+            Tuples (query_id, [(story_id, similarity_score), ...]) in query_ids
+            order, each list sorted by similarity (descending)
+        """
+        if self.matrix is None or k <= 0:
+            return
+        rows_total = len(self.ids)
+        query_ids = list(query_ids)
+        query_rows = [(qid, row) for qid, row in zip(query_ids, self.store.rows_of(query_ids, rows_total).tolist())
+                      if row >= 0]
+        allowed = None
+        if candidate_ids is not None:
+            allowed = np.zeros(rows_total, dtype=bool)
+            cand_rows = self.store.rows_of(candidate_ids, rows_total)
+            allowed[cand_rows[cand_rows >= 0]] = True
+
+        memory_bytes = memory_bytes or self.memory_bytes
+        chunk = max(1, memory_bytes // (4 * rows_total))
+        for start in range(0, len(query_rows), chunk):
+            batch = query_rows[start:start + chunk]
+            rows = np.fromiter((row for _, row in batch), dtype=np.int64, count=len(batch))
+            queries = np.array(self.matrix[rows], dtype=np.float32)
+            query_norms = np.array(self.norms[rows], dtype=np.float32)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                queries /= query_norms[:, np.newaxis]
+            queries[query_norms == 0] = 0
+
+            if self.backend == "threads":
+                futures = [
+                    self._pool.submit(_shard_top_k, self.matrix, self.norms, a, b, queries, rows, k,
+                                      None if allowed is None else allowed[a:b])
+                    for a, b in self.shards
+                ]
+            else:
+                futures = [
+                    self._pool.submit(_process_shard_top_k, a, b, queries, rows, k,
+                                      None if allowed is None else allowed[a:b])
+                    for a, b in self.shards
+                ]
+            shard_results = [future.result() for future in futures]
+
+            # Merge the per-shard top-k lists into the overall top-k
+            merged_rows = np.concatenate([r for r, _ in shard_results], axis=1)
+            merged_scores = np.concatenate([s for _, s in shard_results], axis=1)
+            kk = min(k, merged_scores.shape[1])
+            if kk < merged_scores.shape[1]:
+                top = np.argpartition(merged_scores, -kk, axis=1)[:, -kk:]
+            else:
+                top = np.broadcast_to(np.arange(merged_scores.shape[1]), merged_scores.shape)
+            top_scores = np.take_along_axis(merged_scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top_rows = np.take_along_axis(np.take_along_axis(merged_rows, top, axis=1), order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for i, (qid, _) in enumerate(batch):
+                valid = np.isfinite(top_scores[i]) & (query_norms[i] > 0)
+                yield qid, list(zip(self.ids[top_rows[i][valid]].tolist(), top_scores[i][valid].tolist()))
@@ -0,0 +1,63 @@
+# prefetch.py
+# Background prefetching of stories around the list selection and of adjacent dates
+
+import async_database
+
+
+class Prefetcher:
+    """Warms caches on the async_database event loop so opening a story rarely waits on the database.
+
+    Each request() cancels the previous job, so holding down j/k only ever
+    loads what is around the current selection.
+
+    Args:
+        story_cache: StoryCache to fill
+        fetch_stories: Coroutine function(list of ids) -> {story_id: story}
+        load_date: Coroutine function(datestring) that loads (and caches) a date's titles
+        radius: Rows on each side of the selection whose content is prefetched
+    """
+
+    def __init__(self, story_cache, fetch_stories, load_date, radius=3):
+        self.story_cache = story_cache
+        self.fetch_stories = fetch_stories
+        self.load_date = load_date
+        self.radius = radius
+        self._job = None
+
+    def request(self, story_ids, index, dates=()):
+        """Prefetch the story at index, then its neighbours, then the titles of dates.
+
+        Args:
+            story_ids: Story ids of the list being shown (for a paged date, the
+                       loaded prefix; rows past its end are skipped)
+            index: Highlighted row
+            dates: Datestrings whose titles should be loaded (e.g. the adjacent days)
+        """
+        self.cancel()
+        # Only the rows within radius are copied, however long the list
+        start = max(0, index - self.radius)
+        window = story_ids[start:index + self.radius + 1]
+        self._job = async_database.submit(self._prefetch(window, index - start, list(dates)))
+
+    def cancel(self):
+        """Cancel the running job, if any."""
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+
+    async def _prefetch(self, window, index, dates):
+        """Prefetch window[index] and the rest of window; index may be past the end of window."""
+        try:
+            if window:
+                neighbours = []
+                for step in range(1, self.radius + 1):
+                    neighbours.extend(i for i in (index + step, index - step) if 0 <= i < len(window))
+                # The highlighted story first on its own, the neighbours in one query
+                for rows in ([index] if index < len(window) else [], neighbours):
+                    missing = self.story_cache.missing([window[i] for i in rows])
+                    if missing:
+                        self.story_cache.update(await self.fetch_stories(missing))
+            for date in dates:
+                await self.load_date(date)
+        except Exception:
+            pass  # Prefetching is best effort; the UI fetches on demand
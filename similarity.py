@@ -1,8 +1,11 @@
 # similarity.py
 # KNN similarity search module for story embeddings
 
+import threading
 import numpy as np
 
+BATCH_MEMORY_BYTES = 256 * 1024 * 1024  # score matrix budget per chunk in batch_k_most_similar
+
 def calculate_cosine_similarity(emb1, emb2):
     """Calculate cosine similarity between two embedding vectors.
     
@@ -13,12 +16,12 @@ def calculate_cosine_similarity(emb1, emb2):
     Returns:
         float: Cosine similarity score between -1 and 1, or None if invalid
     """
-    if not emb1 or not emb2:
+    if emb1 is None or emb2 is None or len(emb1) == 0 or len(emb2) == 0:
         return None
     
     # Convert to numpy arrays for vectorized operations
-    e1 = np.array(emb1, dtype=np.float32)
-    e2 = np.array(emb2, dtype=np.float32)
+    e1 = np.asarray(emb1, dtype=np.float32)
+    e2 = np.asarray(emb2, dtype=np.float32)
     
     # Calculate cosine similarity using vectorized operations
     dot_product = np.dot(e1, e2)
@@ -31,12 +34,415 @@ def calculate_cosine_similarity(emb1, emb2):
         return None
 
 
+def top_k_indices(scores, k):
+    """Return the indices of the k highest scores, best first.
+    
+    Uses np.argpartition so only the k winners get fully sorted.
+    Entries equal to -inf are treated as invalid and never returned.
+    
+    Args:
+        scores: 1-D numpy array of similarity scores
+        k: Number of indices to return
+        
+    Returns:
+        numpy array of at most k indices into scores
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(scores[top])[::-1]]
+    return top[np.isfinite(scores[top])]
+
+
+class EmbeddingStore:
+    """All story embeddings in one contiguous float32 matrix.
+    
+    Norms are computed once when rows are added, so a KNN query is a single
+    matrix-vector product followed by an argpartition top-k. Rows are appended
+    into spare capacity, and readers always work from an immutable snapshot of
+    (ids, matrix, norms), so a background loader can keep adding rows while
+    the UI thread searches.
+    
+    Readers take the snapshot and the id -> row mapping from one published
+    (snapshot, row_of) pair. The loader adds ids to row_of in place before
+    it publishes the larger snapshot, so readers only trust rows below the
+    length of their own snapshot.
+    """
+
+    def __init__(self, story_ids=None, vectors=None):
+        self._lock = threading.Lock()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = None
+        self._norms = np.empty(0, dtype=np.float32)
+        self._row_of = {}
+        self._size = 0
+        self._published = ((self._ids[:0], None, self._norms[:0]), self._row_of)
+        if story_ids is not None and len(story_ids) > 0:
+            self.add(story_ids, vectors)
+
+    @classmethod
+    def from_dict(cls, embeddings):
+        """Build a store from a {story_id: [float, ...]} dictionary."""
+        if not embeddings:
+            return cls()
+        story_ids = list(embeddings.keys())
+        vectors = np.asarray([embeddings[sid] for sid in story_ids], dtype=np.float32)
+        return cls(story_ids, vectors)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, story_id):
+        snapshot, row_of = self._published
+        return row_of.get(story_id, len(snapshot[0])) < len(snapshot[0])
+
+    @property
+    def dim(self):
+        """Embedding dimension, or None while the store is empty."""
+        matrix = self._published[0][1]
+        return None if matrix is None else matrix.shape[1]
+
+    def snapshot(self):
+        """Return the current (ids, matrix, norms) arrays.
+        
+        The arrays cover exactly the rows visible at call time; rows added
+        afterwards never show up in an existing snapshot.
+        """
+        return self._published[0]
+
+    def reserve(self, capacity, dim):
+        """Preallocate room for at least capacity rows of width dim."""
+        with self._lock:
+            self._grow(capacity, dim)
+
+    def _grow(self, capacity, dim):
+        if self._matrix is not None and self._matrix.shape[1] != dim:
+            raise ValueError(f"Embedding dimension mismatch: {dim} != {self._matrix.shape[1]}")
+        current = 0 if self._matrix is None else self._matrix.shape[0]
+        if capacity <= current:
+            return
+        matrix = np.empty((capacity, dim), dtype=np.float32)
+        norms = np.empty(capacity, dtype=np.float32)
+        ids = np.empty(capacity, dtype=np.int64)
+        if self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+            norms[:self._size] = self._norms[:self._size]
+            ids[:self._size] = self._ids[:self._size]
+        self._matrix, self._norms, self._ids = matrix, norms, ids
+
+    def add(self, story_ids, vectors):
+        """Append embeddings, or overwrite them if a story id is already present.
+        
+        Args:
+            story_ids: Sequence of story IDs
+            vectors: 2-D array-like of shape (len(story_ids), dim)
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2 or len(vectors) != len(story_ids):
+            raise ValueError("vectors must be a 2-D array with one row per story id")
+        if len(story_ids) == 0:
+            return
+        with self._lock:
+            new_rows = []
+            updated = []
+            for i, sid in enumerate(story_ids):
+                row = self._row_of.get(sid)
+                if row is None:
+                    new_rows.append(i)
+                else:
+                    updated.append((row, i))
+            if updated:
+                # Existing rows may be visible to readers, so replace them
+                # in a copy instead of writing under their feet
+                self._matrix = self._matrix.copy()
+                self._norms = self._norms.copy()
+                for row, i in updated:
+                    self._matrix[row] = vectors[i]
+                    self._norms[row] = np.linalg.norm(vectors[i])
+            if new_rows:
+                if len(new_rows) != len(story_ids):
+                    vectors = vectors[new_rows]
+                    story_ids = [story_ids[i] for i in new_rows]
+                needed = self._size + len(story_ids)
+                capacity = 0 if self._matrix is None else self._matrix.shape[0]
+                if needed > capacity:
+                    self._grow(max(needed, capacity * 2), vectors.shape[1])
+                start, end = self._size, needed
+                self._matrix[start:end] = vectors
+                self._norms[start:end] = np.linalg.norm(vectors, axis=1)
+                self._ids[start:end] = story_ids
+                for offset, sid in enumerate(story_ids):
+                    self._row_of[sid] = start + offset
+                self._size = end
+            self._published = (
+                (self._ids[:self._size], self._matrix[:self._size], self._norms[:self._size]),
+                self._row_of,
+            )
+
+    def replace(self, story_ids, matrix, norms=None, appended=False):
+        """Swap in a complete set of rows, e.g. a memory-mapped on-disk cache.
+        
+        The arrays are used as-is without copying; a later add() copies them
+        into a growable in-memory buffer.
+        
+        Args:
+            story_ids: 1-D int64 array of story IDs
+            matrix: 2-D float32 array (or np.memmap) with one row per story id
+            norms: Optional precomputed row norms; computed when omitted
+            appended: True if the new arrays are the current rows plus rows
+                      appended at the end, so only the new ids get indexed
+        """
+        ids = np.asarray(story_ids, dtype=np.int64)
+        if norms is None:
+            norms = np.linalg.norm(matrix, axis=1).astype(np.float32)
+        with self._lock:
+            if appended and len(ids) >= self._size:
+                row_of = self._row_of
+                row_of.update(zip(ids[self._size:].tolist(), range(self._size, len(ids))))
+            else:
+                row_of = dict(zip(ids.tolist(), range(len(ids))))
+            self._ids, self._matrix, self._norms = ids, matrix, norms
+            self._row_of = row_of
+            self._size = len(ids)
+            # One assignment, so no reader pairs the new rows with the old arrays
+            self._published = ((ids, matrix, norms), row_of)
+
+    def get(self, story_id):
+        """Return the embedding for story_id as a float32 array, or None."""
+        (ids, matrix, _), row_of = self._published
+        row = row_of.get(story_id)
+        if row is None or row >= len(ids):
+            return None
+        return matrix[row]
+
+    def rows_of(self, story_ids, size=None):
+        """Rows of story_ids in the snapshot matrix, as an int64 array (-1 where there is none).
+        
+        Args:
+            story_ids: Iterable of story IDs
+            size: Number of rows in the snapshot the rows will index (default:
+                  the current one); rows appended after it count as missing
+        """
+        snapshot, row_of = self._published
+        size = len(snapshot[0]) if size is None else min(size, len(snapshot[0]))
+        rows = np.fromiter((row_of.get(sid, -1) for sid in story_ids), dtype=np.int64)
+        rows[rows >= size] = -1
+        return rows
+
+    def scores(self, query_embedding, rows=None):
+        """Cosine similarity of the query against every row (or the given rows).
+        
+        Rows with a zero norm score -inf so they are never returned.
+        """
+        return self._scores(self._published[0], query_embedding, rows)
+
+    @staticmethod
+    def _scores(snapshot, query_embedding, rows=None):
+        _, matrix, norms = snapshot
+        if matrix is None:
+            return np.empty(0, dtype=np.float32)
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query_norm = np.linalg.norm(query)
+        if rows is not None:
+            matrix = matrix[rows]
+            norms = norms[rows]
+        if query_norm == 0:
+            return np.full(len(norms), -np.inf, dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = (matrix @ query) / (norms * query_norm)
+        scores[norms == 0] = -np.inf
+        return scores
+
+    def find_k_most_similar(self, query_embedding, k=5, exclude_query_id=None, candidate_ids=None):
+        """Find the k most similar stories to a query embedding.
+        
+        Args:
+            query_embedding: The embedding vector for the query story
+            k: Number of most similar stories to return
+            exclude_query_id: Story ID to exclude from results (the query story itself)
+            candidate_ids: Optional iterable of story IDs to restrict the search to.
+                           None searches every stored embedding.
+            
+        Returns:
+            List of tuples: [(story_id, similarity_score), ...] sorted by similarity (descending)
+        """
+        if query_embedding is None or len(query_embedding) == 0:
+            return []
+        snapshot, row_of = self._published
+        ids = snapshot[0]
+        rows = None
+        if candidate_ids is not None:
+            rows = np.fromiter(
+                (r for r in (row_of.get(sid) for sid in candidate_ids) if r is not None and r < len(ids)),
+                dtype=np.int64
+            )
+            if len(rows) == 0:
+                return []
+        scores = self._scores(snapshot, query_embedding, rows)
+        if exclude_query_id is not None:
+            exclude_row = row_of.get(exclude_query_id)
+            if exclude_row is not None and exclude_row < len(ids):
+                if rows is None:
+                    scores[exclude_row] = -np.inf
+                else:
+                    scores[rows == exclude_row] = -np.inf
+        top = top_k_indices(scores, k)
+        result_rows = top if rows is None else rows[top]
+        return list(zip(ids[result_rows].tolist(), scores[top].tolist()))
+
+
+    def batch_k_most_similar(self, query_ids, k=5, candidate_ids=None, memory_bytes=BATCH_MEMORY_BYTES):
+        """Find the k most similar stories for many stored stories at once.
+        
+        Queries are scored a chunk at a time with one matrix-matrix product
+        (chunk x candidates), the chunk sized so its score matrix stays
+        within memory_bytes. Each query's own row is never returned.
+        
+        Args:
+            query_ids: Story IDs to find neighbours for; ids without an
+                       embedding in the store are skipped
+            k: Number of most similar stories per query
+            candidate_ids: Optional iterable of story IDs to restrict the search to.
+                           None searches every stored embedding.
+            memory_bytes: Upper bound on the size of one chunk's score matrix
+            
+        Yields:
+            Tuples (query_id, [(story_id, similarity_score), ...]) in query_ids
+            order, each list sorted by similarity (descending)
+        """
+        (ids, matrix, norms), row_of = self._published
+        if matrix is None or k <= 0:
+            return
+        query_rows = [(qid, row_of.get(qid)) for qid in query_ids]
+        query_rows = [(qid, row) for qid, row in query_rows if row is not None and row < len(ids)]
+        if candidate_ids is None:
+            cand_rows = None
+            cand_ids, cand_matrix, cand_norms = ids, matrix, norms
+        else:
+            cand_rows = np.fromiter(
+                (r for r in (row_of.get(sid) for sid in candidate_ids) if r is not None and r < len(ids)),
+                dtype=np.int64
+            )
+            cand_ids, cand_matrix, cand_norms = ids[cand_rows], matrix[cand_rows], norms[cand_rows]
+        if not query_rows or len(cand_ids) == 0:
+            return
+        # Column of each query among the candidates, to exclude it from its own results
+        if cand_rows is None:
+            self_col = {row: row for _, row in query_rows}
+        else:
+            self_col = {row: col for col, row in enumerate(cand_rows.tolist())}
+        
+        with np.errstate(divide='ignore'):
+            inv_cand_norms = np.where(cand_norms > 0, 1.0 / cand_norms, 0).astype(np.float32)
+        k = min(k, len(cand_ids))
+        chunk = max(1, memory_bytes // (4 * len(cand_ids)))
+        for start in range(0, len(query_rows), chunk):
+            batch = query_rows[start:start + chunk]
+            rows = np.fromiter((row for _, row in batch), dtype=np.int64, count=len(batch))
+            query_norms = norms[rows]
+            scores = matrix[rows] @ cand_matrix.T
+            scores *= inv_cand_norms
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores /= query_norms[:, np.newaxis]
+            scores[:, cand_norms == 0] = -np.inf
+            scores[query_norms == 0] = -np.inf
+            for i, row in enumerate(rows.tolist()):
+                col = self_col.get(row)
+                if col is not None:
+                    scores[i, col] = -np.inf
+            if k < len(cand_ids):
+                top = np.argpartition(scores, -k, axis=1)[:, -k:]
+            else:
+                top = np.broadcast_to(np.arange(len(cand_ids)), (len(batch), len(cand_ids)))
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for (qid, _), cols, row_scores in zip(batch, top, top_scores):
+                valid = np.isfinite(row_scores)
+                yield qid, list(zip(cand_ids[cols[valid]].tolist(), row_scores[valid].tolist()))
+
+
+class IncrementalKNN:
+    """Exact top-k search that keeps up with rows appended to an EmbeddingStore.
+    
+    Each update() scores only the rows added since the previous call and
+    merges them into the running top-k, so a search can start while the
+    embeddings are still loading and be refined as batches arrive.
+    
+    Args:
+        store: EmbeddingStore to search
+        query_embedding: The embedding vector for the query story
+        k: Number of most similar stories to return
+        exclude_query_id: Story ID to exclude from results (the query story itself)
+    """
+    
+    def __init__(self, store, query_embedding, k=5, exclude_query_id=None):
+        self.store = store
+        self.query = np.asarray(query_embedding, dtype=np.float32)
+        self.query_norm = float(np.linalg.norm(self.query))
+        self.k = k
+        self.exclude_query_id = exclude_query_id
+        self.rows_searched = 0
+        self._last_id = None  # id of row rows_searched - 1, to notice a replaced store
+        self._top_ids = np.empty(0, dtype=np.int64)
+        self._top_scores = np.empty(0, dtype=np.float32)
+    
+    def update(self):
+        """Score the rows appended since the last call.
+        
+        Returns:
+            True if any new rows were searched
+        """
+        ids, matrix, norms = self.store.snapshot()
+        if self.rows_searched and (len(ids) < self.rows_searched or
+                                   int(ids[self.rows_searched - 1]) != self._last_id):
+            # Store was rebuilt from scratch: start over
+            self.rows_searched = 0
+            self._top_ids = self._top_ids[:0]
+            self._top_scores = self._top_scores[:0]
+        start, end = self.rows_searched, len(ids)
+        if end == start or self.query_norm == 0:
+            return False
+        
+        new_ids = ids[start:end]
+        new_norms = norms[start:end]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scores = (matrix[start:end] @ self.query) / (new_norms * self.query_norm)
+        scores[new_norms == 0] = -np.inf
+        if self.exclude_query_id is not None:
+            scores[new_ids == self.exclude_query_id] = -np.inf
+        
+        candidate_ids = np.concatenate((self._top_ids, new_ids))
+        candidate_scores = np.concatenate((self._top_scores, scores.astype(np.float32, copy=False)))
+        top = top_k_indices(candidate_scores, self.k)
+        self._top_ids = candidate_ids[top]
+        self._top_scores = candidate_scores[top]
+        self.rows_searched = end
+        self._last_id = int(ids[end - 1])
+        return True
+    
+    @property
+    def results(self):
+        """Current top-k as [(story_id, similarity_score), ...], best first."""
+        return list(zip(self._top_ids.tolist(), self._top_scores.tolist()))
+
+
 def find_k_most_similar(query_embedding, candidate_embeddings, candidate_ids, k=5, exclude_query_id=None):
     """Find the k most similar stories to a query story using cosine similarity.
     
+    Accepts either a plain {story_id: embedding} dictionary or an
+    EmbeddingStore. Passing a dictionary builds a temporary matrix on every
+    call, so long-lived callers should keep an EmbeddingStore instead.
+    
     Args:
         query_embedding: The embedding vector for the query story (list of floats)
-        candidate_embeddings: Dictionary mapping story_id to embedding: {story_id: [float, ...], ...}
+        candidate_embeddings: Dictionary mapping story_id to embedding: {story_id: [float, ...], ...},
+                              or an EmbeddingStore
         candidate_ids: List of story IDs to search through (only these will be considered)
         k: Number of most similar stories to return
         exclude_query_id: Story ID to exclude from results (the query story itself)
@@ -44,27 +450,20 @@ def find_k_most_similar(query_embedding, candidate_embeddings, candidate_ids, k=
     Returns:
         List of tuples: [(story_id, similarity_score), ...] sorted by similarity (descending)
     """
-    if not query_embedding:
+    if query_embedding is None or len(query_embedding) == 0:
         return []
     
-    similarity_scores = []
-    
-    for story_id in candidate_ids:
-        # Skip the query story itself
-        if exclude_query_id is not None and story_id == exclude_query_id:
-            continue
-        
-        # Get embedding for this candidate
-        candidate_emb = candidate_embeddings.get(story_id)
-        if not candidate_emb:
-            continue
-        
-        # Calculate similarity
-        similarity = calculate_cosine_similarity(query_embedding, candidate_emb)
-        if similarity is not None:
-            similarity_scores.append((story_id, similarity))
-    
-    # Sort by similarity (descending) and take top k
-    similarity_scores.sort(key=lambda x: x[1], reverse=True)
-    return similarity_scores[:k]
-
+    if isinstance(candidate_embeddings, EmbeddingStore):
+        store = candidate_embeddings
+    else:
+        store = EmbeddingStore.from_dict({
+            sid: candidate_embeddings[sid]
+            for sid in candidate_ids
+            if candidate_embeddings.get(sid) is not None and len(candidate_embeddings[sid]) > 0
+        })
+    return store.find_k_most_similar(
+        query_embedding,
+        k=k,
+        exclude_query_id=exclude_query_id,
+        candidate_ids=candidate_ids
+    )
@@ -0,0 +1,98 @@
+# story_cache.py
+# Bounded LRU cache of loaded stories, shared by the list and story views
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+DEFAULT_BUDGET_BYTES = int(float(os.getenv("STORY_CACHE_MB", "64")) * 1024 * 1024)
+
+
+def story_size(story):
+    """Approximate memory used by a story dict, in bytes."""
+    return sum(sys.getsizeof(value) for value in story.values())
+
+
+class StoryCache:
+    """LRU cache of story dicts keyed by story id, bounded by total size in bytes.
+
+    Entries are not tied to a date, so going back to a day (or a story
+    reached through KNN) costs no database work while it is still cached.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # story_id -> (story, size)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, story_id):
+        """Membership test; does not count as a hit or miss or refresh the entry."""
+        return story_id in self._entries
+
+    def get(self, story_id):
+        """Return the cached story (marking it most recently used), or None."""
+        with self._lock:
+            entry = self._entries.get(story_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(story_id)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, story_id):
+        """Return the cached story or None, without counting a hit/miss or refreshing it."""
+        entry = self._entries.get(story_id)
+        return entry[0] if entry is not None else None
+
+    def put(self, story_id, story):
+        """Add or replace a story, evicting least recently used ones over the budget.
+
+        A story larger than the whole budget is not cached.
+        """
+        size = story_size(story)
+        with self._lock:
+            old = self._entries.pop(story_id, None)
+            if old is not None:
+                self.size_bytes -= old[1]
+            if size > self.budget_bytes:
+                return
+            self._entries[story_id] = (story, size)
+            self.size_bytes += size
+            while self.size_bytes > self.budget_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.size_bytes -= evicted_size
+
+    def update(self, stories):
+        """put() every item of a {story_id: story} dict."""
+        for story_id, story in stories.items():
+            self.put(story_id, story)
+
+    def missing(self, story_ids):
+        """The ids in story_ids that are not cached, in order."""
+        return [sid for sid in story_ids if sid not in self._entries]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+    def stats(self):
+        """Dict with 'entries', 'bytes', 'budget_bytes', 'hits', 'misses' and 'hit_rate'."""
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size_bytes,
+            'budget_bytes': self.budget_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,7 @@
+# tests/conftest.py
+# The modules live at the repository root; make them importable from the tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
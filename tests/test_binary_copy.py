@@ -0,0 +1,71 @@
+# tests/test_binary_copy.py
+# decode_binary_copy on hand-built COPY ... TO STDOUT (FORMAT binary) streams
+
+import struct
+
+import numpy as np
+import pytest
+
+from database import decode_binary_copy
+
+FLOAT4_OID = 700
+
+
+def copy_stream(rows, id_len=8):
+    """Encode (story_id, embedding or None) rows the way PostgreSQL's binary COPY does.
+
+    An embedding may contain None elements (NULLs inside the array).
+    """
+    out = bytearray(b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0))
+    for story_id, embedding in rows:
+        out += struct.pack(">h", 2)
+        out += struct.pack(">i", id_len) + story_id.to_bytes(id_len, "big", signed=True)
+        if embedding is None:
+            out += struct.pack(">i", -1)
+            continue
+        has_null = any(value is None for value in embedding)
+        array = struct.pack(">iiiii", 1, int(has_null), FLOAT4_OID, len(embedding), 1)
+        for value in embedding:
+            array += struct.pack(">i", -1) if value is None else struct.pack(">if", 4, value)
+        out += struct.pack(">i", len(array)) + array
+    out += struct.pack(">h", -1)
+    return bytes(out)
+
+
+@pytest.mark.parametrize("id_len", [4, 8])
+def test_round_trip(id_len):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 8)).astype(np.float32)
+    ids = list(range(1, 51))
+    story_ids, decoded, last_id = decode_binary_copy(copy_stream(zip(ids, vectors.tolist()), id_len))
+    assert story_ids.dtype == np.int64 and decoded.dtype == np.float32
+    assert story_ids.tolist() == ids
+    np.testing.assert_array_equal(decoded, vectors)
+    assert last_id == 50
+
+
+def test_irregular_rows_are_dropped_but_counted():
+    rows = [
+        (1, [1.0, 2.0, 3.0]),
+        (2, None),               # NULL embedding
+        (3, [4.0, 5.0, 6.0]),
+        (4, [1.0, None, 3.0]),   # NULL element
+        (5, [7.0, 8.0]),         # other dimension
+        (6, [9.0, 10.0, 11.0]),
+        (7, None),
+    ]
+    story_ids, vectors, last_id = decode_binary_copy(copy_stream(rows))
+    assert story_ids.tolist() == [1, 3, 6]
+    np.testing.assert_array_equal(vectors, [[1, 2, 3], [4, 5, 6], [9, 10, 11]])
+    assert last_id == 7
+
+
+def test_empty_stream():
+    story_ids, vectors, last_id = decode_binary_copy(copy_stream([]))
+    assert len(story_ids) == 0 and vectors.shape[0] == 0
+    assert last_id is None
+
+
+def test_rejects_other_input():
+    with pytest.raises(ValueError):
+        decode_binary_copy(b"1\t[1,2,3]\n")
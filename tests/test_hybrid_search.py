@@ -0,0 +1,29 @@
+# tests/test_hybrid_search.py
+# Reciprocal rank fusion ordering
+
+import pytest
+
+from hybrid_search import reciprocal_rank_fusion
+
+
+def test_items_in_both_rankings_come_first():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 4, 1]], k=60)
+    assert [sid for sid, _ in fused] == [1, 3, 2, 4]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 63)
+    assert fused[1][1] == pytest.approx(1 / 63 + 1 / 61)
+
+
+def test_scores_are_descending_and_limited():
+    fused = reciprocal_rank_fusion([[5, 6, 7, 8], [8, 7], [7]], k=1, limit=3)
+    scores = [score for _, score in fused]
+    assert scores == sorted(scores, reverse=True)
+    assert [sid for sid, _ in fused] == [7, 8, 5]
+
+
+def test_ties_keep_first_seen_order():
+    fused = reciprocal_rank_fusion([[1, 2], [2, 1]], k=60)
+    assert [sid for sid, _ in fused] == [1, 2]
+
+
+def test_empty_rankings():
+    assert reciprocal_rank_fusion([[], []]) == []
@@ -0,0 +1,32 @@
+# tests/test_parallel_knn.py
+# ParallelKNN against EmbeddingStore.batch_k_most_similar
+
+import numpy as np
+import pytest
+
+from similarity import EmbeddingStore
+from parallel_knn import ParallelKNN
+
+
+@pytest.fixture
+def store():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    vectors[3] = 0  # a zero vector must never be returned
+    return EmbeddingStore(np.arange(1000, 1500, dtype=np.int64), vectors)
+
+
+@pytest.mark.parametrize("backend", ["threads", "processes"])
+def test_parallel_knn_matches_store(store, backend):
+    ids = store.snapshot()[0]
+    query_ids = [int(sid) for sid in ids[:30]] + [99999]
+    candidates = [int(sid) for sid in ids[1::2]]
+    with ParallelKNN(store, workers=3, backend=backend) as knn:
+        for kwargs in ({}, {'candidate_ids': candidates}):
+            expected = list(store.batch_k_most_similar(query_ids, 8, **kwargs))
+            got = list(knn.batch_k_most_similar(query_ids, 8, **kwargs))
+            assert [qid for qid, _ in got] == [qid for qid, _ in expected]
+            for (_, got_list), (_, expected_list) in zip(got, expected):
+                assert [sid for sid, _ in got_list] == [sid for sid, _ in expected_list]
+                np.testing.assert_allclose([s for _, s in got_list], [s for _, s in expected_list],
+                                           rtol=1e-5, atol=1e-6)
@@ -0,0 +1,127 @@
+# tests/test_similarity.py
+# EmbeddingStore and IncrementalKNN against a brute-force top-k
+
+import numpy as np
+import pytest
+
+from similarity import EmbeddingStore, IncrementalKNN
+
+N_ROWS = 500
+DIM = 16
+
+
+def brute_force(ids, vectors, query, k, exclude_id=None, candidate_ids=None):
+    """Top-k (story_id, cosine) pairs by scoring every row in Python."""
+    scored = []
+    for sid, vector in zip(ids, vectors):
+        if sid == exclude_id or (candidate_ids is not None and sid not in candidate_ids):
+            continue
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            continue
+        scored.append((sid, float(vector @ query / (norm * np.linalg.norm(query)))))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return scored[:k]
+
+
+def assert_same_results(got, expected):
+    assert [sid for sid, _ in got] == [sid for sid, _ in expected]
+    np.testing.assert_allclose([s for _, s in got], [s for _, s in expected], rtol=1e-5, atol=1e-6)
+
+
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    ids = np.arange(1000, 1000 + N_ROWS, dtype=np.int64)
+    vectors = rng.normal(size=(N_ROWS, DIM)).astype(np.float32)
+    vectors[3] = 0  # a zero vector must never be returned
+    return ids, vectors
+
+
+def test_find_k_most_similar_matches_brute_force(data):
+    ids, vectors = data
+    store = EmbeddingStore(ids, vectors)
+    query_id = int(ids[10])
+    got = store.find_k_most_similar(vectors[10], k=7, exclude_query_id=query_id)
+    assert query_id not in [sid for sid, _ in got]
+    assert_same_results(got, brute_force(ids, vectors, vectors[10], 7, exclude_id=query_id))
+
+
+def test_find_k_most_similar_with_candidates(data):
+    ids, vectors = data
+    store = EmbeddingStore(ids, vectors)
+    # Includes the query itself, the zero vector and an unknown id
+    candidates = {int(sid) for sid in ids[::3]} | {int(ids[10]), int(ids[3]), 99999}
+    got = store.find_k_most_similar(vectors[10], k=5, exclude_query_id=int(ids[10]), candidate_ids=candidates)
+    expected = brute_force(ids, vectors, vectors[10], 5, exclude_id=int(ids[10]), candidate_ids=candidates)
+    assert_same_results(got, expected)
+
+
+def test_k_larger_than_store_returns_every_row():
+    store = EmbeddingStore([1, 2, 3], np.eye(3, dtype=np.float32))
+    got = store.find_k_most_similar(np.array([1, 0, 0], dtype=np.float32), k=10, exclude_query_id=1)
+    assert sorted(sid for sid, _ in got) == [2, 3]
+
+
+def test_batch_k_most_similar_matches_single_queries(data):
+    ids, vectors = data
+    store = EmbeddingStore(ids, vectors)
+    query_ids = [int(sid) for sid in ids[:40]] + [99999]  # unknown ids are skipped
+    candidates = [int(sid) for sid in ids[::2]]
+    # A small memory budget forces several chunks
+    results = list(store.batch_k_most_similar(query_ids, k=6, candidate_ids=candidates,
+                                              memory_bytes=4 * N_ROWS * 7))
+    assert [qid for qid, _ in results] == query_ids[:40]
+    for qid, got in results:
+        row = qid - 1000
+        if row == 3:
+            assert got == []
+            continue
+        expected = brute_force(ids, vectors, vectors[row], 6, exclude_id=qid, candidate_ids=set(candidates))
+        assert_same_results(got, expected)
+
+
+def test_incremental_knn_follows_appended_rows(data):
+    ids, vectors = data
+    store = EmbeddingStore(ids[:200], vectors[:200])
+    knn = IncrementalKNN(store, vectors[250], k=5, exclude_query_id=int(ids[250]))
+    knn.update()
+    store.add(ids[200:], vectors[200:])
+    knn.update()
+    assert knn.rows_searched == N_ROWS
+    assert_same_results(knn.results, brute_force(ids, vectors, vectors[250], 5, exclude_id=int(ids[250])))
+
+
+def test_rows_of_respects_snapshot_size(data):
+    ids, vectors = data
+    store = EmbeddingStore(ids[:10], vectors[:10])
+    size = len(store)
+    store.add(ids[10:20], vectors[10:20])
+    rows = store.rows_of([int(ids[0]), int(ids[15]), 99999], size)
+    assert rows.tolist() == [0, -1, -1]
+
+
+def test_readers_ignore_rows_not_yet_published(data):
+    ids, vectors = data
+    store = EmbeddingStore(ids[:10], vectors[:10])
+    # What a reader sees while add() has indexed a new id but not yet published its row
+    store._row_of[int(ids[10])] = 10
+    new_id = int(ids[10])
+    assert new_id not in store
+    assert store.get(new_id) is None
+    assert store.rows_of([new_id]).tolist() == [-1]
+    assert store.find_k_most_similar(vectors[10], k=3, candidate_ids=[new_id]) == []
+    assert dict(store.batch_k_most_similar([new_id], k=3)) == {}
+
+
+def test_replace_publishes_rows_and_arrays_together(data):
+    ids, vectors = data
+    store = EmbeddingStore(ids[:10], vectors[:10])
+    before, _ = store._published
+    store.replace(ids[10:0:-1], vectors[10:0:-1])
+    snapshot, row_of = store._published
+    assert snapshot[0] is not before[0]
+    for sid in ids[1:11].tolist():
+        assert snapshot[0][row_of[sid]] == sid
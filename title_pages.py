@@ -0,0 +1,92 @@
+# title_pages.py
+# Titles of one date loaded page by page, so huge days show their first screen at once
+
+import asyncio
+
+import async_database
+from database import PAGE_SIZE
+LOADING_TITLE = "..."  # shown for rows whose page has not arrived yet
+
+
+class TitlePages:
+    """Story titles for one date, fetched in keyset pages as they are needed.
+
+    Behaves as a sequence of titles whose length is the date's total story
+    count; rows past `loaded` read as LOADING_TITLE until their page
+    arrives. `ids` and `titles` hold the loaded prefix and only ever grow
+    (pages are appended on the async_database loop), so the UI thread can
+    read them while more pages come in.
+
+    Args:
+        fetch_page: Coroutine function(after_id, limit) -> [(story_id, title), ...] in id order
+        total: Number of stories the date is expected to have
+        page_size: Rows per page
+    """
+
+    def __init__(self, fetch_page, total, page_size=PAGE_SIZE):
+        self.fetch_page = fetch_page
+        self.total = total
+        self.page_size = page_size
+        self.ids = []
+        self.titles = []
+        self.complete = False
+        self._wanted = 0
+        self._job = None
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.ids) if self.complete else max(self.total, len(self.ids))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.titles[index] if index < len(self.titles) else LOADING_TITLE
+
+    @property
+    def loaded(self):
+        return len(self.titles)
+
+    async def load(self, count):
+        """Fetch pages until at least count titles are loaded (or the date is exhausted)."""
+        while not self.complete and len(self.titles) < count:
+            async with self._lock:
+                # Another caller may have fetched the page while this one waited
+                if self.complete or len(self.titles) >= count:
+                    break
+                after_id = self.ids[-1] if self.ids else None
+                page = await self.fetch_page(after_id, self.page_size)
+                self.ids.extend(sid for sid, _ in page)
+                self.titles.extend(title for _, title in page)
+                if len(page) < self.page_size:
+                    self.complete = True
+                    self.total = len(self.ids)
+
+    async def load_all(self):
+        await self.load(float("inf"))
+
+    def request(self, count):
+        """Load up to count titles in the background; returns immediately."""
+        if self.complete or count <= max(self._wanted, len(self.titles)):
+            return
+        self._wanted = count
+        if self._job is None or self._job.done():
+            self._job = async_database.submit(self._load_wanted())
+
+    async def _load_wanted(self):
+        try:
+            # _wanted can grow while pages load; keep going until it is reached
+            while not self.complete and len(self.titles) < self._wanted:
+                await self.load(self._wanted)
+        except Exception:
+            pass  # Rows stay LOADING_TITLE; opening one loads it on demand and reports errors
+
+    def cancel(self):
+        """Stop loading pages in the background."""
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        self._wanted = len(self.titles)
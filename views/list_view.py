@@ -4,14 +4,37 @@ import curses
 import datetime
 from .command_mode import command_mode
 
-def display_list(stdscr, titles, datestring, initial_selection=0):
+HEADER_ROWS = 2  # title line plus a blank line
+FOOTER_ROWS = 1
+TAB_WIDTH = 8
+
+def _format_row(idx, title, x, width):
+    """Row text for one title, with the tab expanded as curses would and cut to width."""
+    line = f"{idx+1}:\t{title}"
+    # Expand relative to the screen column so the titles stay aligned
+    line = (" " * x + line).expandtabs(TAB_WIDTH)[x:]
+    return line[:max(0, width)]
+
+def display_list(stdscr, titles, datestring, initial_selection=0, on_select=None):
     """
+    Only the rows inside the viewport are drawn. Moving the highlight repaints
+    just the two rows involved; the whole screen is redrawn only when the
+    viewport scrolls or the terminal is resized. Updates are batched with
+    noutrefresh/doupdate.
+
+    on_select, if given, is called with the highlighted row whenever it changes
+    (and once at the start), e.g. to prefetch the stories around it.
+
+    titles may be a TitlePages: a screen of rows past the viewport is
+    requested as it scrolls, and rows still loading are redrawn once
+    their page arrives.
+
     Returns:
       - None (if user ESC/q)
       - int (the selected index if user presses ENTER)
       - ("command", user_input, current_row) if user typed ':'.
     """
-    current_row = initial_selection
+    current_row = max(0, min(initial_selection, len(titles) - 1))
     # Handle KNN Results or regular date strings
     if datestring == "KNN Results":
         current_date = "KNN Results"
@@ -21,31 +44,79 @@ def display_list(stdscr, titles, datestring, initial_selection=0):
         except ValueError:
             current_date = datestring  # Fallback to original string if parsing fails
 
+    x = 2
+    top = 0               # first title in the viewport
+    drawn_top = None      # viewport last drawn in full; None forces a full redraw
+    drawn_row = None      # highlighted row on screen
+    notified_row = None
+    paged = hasattr(titles, "request")
+    drawn_loaded = None   # titles.loaded at the last full redraw
+
+    def draw_row(idx, width):
+        y = HEADER_ROWS + idx - top
+        stdscr.move(y, 0)
+        stdscr.clrtoeol()
+        line = _format_row(idx, titles[idx], x, width - x - 1)
+        if idx == current_row:
+            stdscr.addstr(y, x, line, curses.A_REVERSE)
+        else:
+            stdscr.addstr(y, x, line)
+
     while True:
-        stdscr.clear()
+        if on_select is not None and current_row != notified_row:
+            on_select(current_row)
+            notified_row = current_row
+
         h, w = stdscr.getmaxyx()
-        header = f"Stories for {current_date}"
-        stdscr.addstr(0, 2, header, curses.A_BOLD)
+        visible = max(1, h - HEADER_ROWS - FOOTER_ROWS)
+        # Scroll just enough to keep the highlighted row in view
+        if current_row < top:
+            top = current_row
+        elif current_row >= top + visible:
+            top = current_row - visible + 1
+        top = max(0, min(top, max(0, len(titles) - visible)))
 
-        for idx, title in enumerate(titles):
-            x = 2
-            y = idx + 2
-            line = f"{idx+1}:\t{title}"
-            if idx == current_row:
-                stdscr.attron(curses.A_REVERSE)
-                stdscr.addstr(y, x, line)
-                stdscr.attroff(curses.A_REVERSE)
-            else:
-                stdscr.addstr(y, x, line)
+        if paged:
+            titles.request(top + 2 * visible)
+            if drawn_loaded is not None and titles.loaded != drawn_loaded and drawn_loaded < top + visible:
+                drawn_top = None  # a page arrived for rows on screen
+            # Poll for the page while rows in view are still loading
+            stdscr.timeout(100 if titles.loaded < min(len(titles), top + visible) else -1)
 
-        stdscr.addstr(
-            h - 1,
-            0,
-            "Use UP/DOWN/j/k to navigate, ENTER to select, : for commands (use :k<N> for similar stories), ESC/q to exit."
-        )
-        stdscr.refresh()
+        if drawn_top != top:
+            stdscr.erase()
+            header = f"Stories for {current_date}"
+            if len(titles) > visible:
+                header += f"  ({current_row + 1}/{len(titles)})"
+            stdscr.addnstr(0, 2, header, max(0, w - 3), curses.A_BOLD)
+            for idx in range(top, min(len(titles), top + visible)):
+                draw_row(idx, w)
+            stdscr.addnstr(
+                h - 1,
+                0,
+                "Use UP/DOWN/j/k to navigate, ENTER to select, : for commands (:k<N> similar stories, :s <words> search), ESC/q to exit.",
+                max(0, w - 1)
+            )
+            drawn_top = top
+            drawn_loaded = titles.loaded if paged else None
+        elif drawn_row != current_row:
+            # Same viewport: repaint only the rows whose highlight changed
+            if drawn_row is not None and top <= drawn_row < min(len(titles), top + visible):
+                draw_row(drawn_row, w)
+            if titles:
+                draw_row(current_row, w)
+            if len(titles) > visible:
+                stdscr.move(0, 0)
+                stdscr.clrtoeol()
+                stdscr.addnstr(0, 2, f"Stories for {current_date}  ({current_row + 1}/{len(titles)})",
+                               max(0, w - 3), curses.A_BOLD)
+        drawn_row = current_row
+        stdscr.noutrefresh()
+        curses.doupdate()
 
         key = stdscr.getch()
+        if paged:
+            stdscr.timeout(-1)
         if key in (curses.KEY_UP, ord('k')):
             if current_row > 0:
                 current_row -= 1
@@ -56,6 +127,16 @@ def display_list(stdscr, titles, datestring, initial_selection=0):
                 current_row += 1
             else:
                 current_row = 0
+        elif key == curses.KEY_NPAGE:
+            current_row = min(len(titles) - 1, current_row + visible) if titles else 0
+        elif key == curses.KEY_PPAGE:
+            current_row = max(0, current_row - visible)
+        elif key == curses.KEY_HOME:
+            current_row = 0
+        elif key == curses.KEY_END:
+            current_row = max(0, len(titles) - 1)
+        elif key == curses.KEY_RESIZE:
+            drawn_top = None
         elif key in [curses.KEY_ENTER, 10, 13]:
             return current_row
         elif key == 27 or key in [ord('q'), ord('Q')]:
@@ -63,6 +144,7 @@ def display_list(stdscr, titles, datestring, initial_selection=0):
         elif key == ord(':'):
             command = command_mode(stdscr)
             if command is None:
-                # user pressed ESC at the command prompt
+                # user pressed ESC at the command prompt; it drew over the footer
+                drawn_top = None
                 continue
             return ("command", command, current_row)
@@ -0,0 +1,39 @@
+# views/messages.py
+
+import curses
+
+def draw_knn_progress(stdscr, k, approximate, rows_searched, progress, titles):
+    """Draw the partial results of a running KNN search.
+    
+    Args:
+        k: Number of neighbours asked for
+        approximate: True when the search uses the IVF index
+        rows_searched: Embeddings compared so far
+        progress: {'loaded', 'total'} of the background embedding load, or None once it finished
+        titles: Titles of the current best matches, best first
+    """
+    stdscr.erase()
+    h, w = stdscr.getmaxyx()
+    kind = " (approximate)" if approximate else ""
+    stdscr.addnstr(0, 2, f"Searching for {k} similar stories{kind}...", w - 3, curses.A_BOLD)
+    status = f"{rows_searched} embeddings searched"
+    if progress is not None:
+        if progress['total']:
+            status += f", {progress['loaded']} / {progress['total']} new embeddings loaded"
+        else:
+            status += ", embeddings still loading"
+    if h > 2:
+        stdscr.addnstr(2, 2, status, w - 3)
+    for i, title in enumerate(titles[:max(0, h - 6)]):
+        stdscr.addnstr(4 + i, 2, f"{i + 1}:\t{title}", w - 3)
+    if h > 4:
+        stdscr.addnstr(h - 1, 0, "Results are refined as embeddings arrive. ENTER: show these results now, ESC: cancel.", w - 1)
+    stdscr.refresh()
+
+def show_message(stdscr, message):
+    """Show a bold one-line message and wait for a key press."""
+    stdscr.clear()
+    stdscr.addstr(0, 2, message, curses.A_BOLD)
+    stdscr.addstr(2, 2, "Press any key to continue...")
+    stdscr.refresh()
+    stdscr.getch()
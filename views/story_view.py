@@ -1,14 +1,26 @@
 # views/story_view.py
 
 import curses
+import sys
 import textwrap
 import datetime
-import hashlib
+from collections import OrderedDict
 from .command_mode import command_mode
 
-# Cache for wrapped text lines: {cache_key: {'wrapped_lines': [...], 'col_width': int}}
-_wrapped_cache = {}
+# LRU cache of formatted story rows: {(story_id, col_width): StoryRows}
+ROWS_CACHE_BYTES = 16 * 1024 * 1024
+_rows_cache = OrderedDict()
 
+# Stories up to this many characters are wrapped in one go so the columns
+# split exactly in half; longer ones are wrapped lazily as they are scrolled
+EAGER_WRAP_CHARS = 50000
+
+# Height of the drawing pad in screens; it holds the rows around the view,
+# not the whole story
+PAD_SCREENS = 4
+
+EVEN_LANDMARK = "♦︎"
+ODD_LANDMARK = "♢"
 
 def _format_issue_date(raw_date):
     """Format the provided issue_date into a human-readable string."""
@@ -32,31 +44,133 @@ def _format_issue_date(raw_date):
 
     return date_obj.strftime("%B %d, %Y")
 
-def _get_cache_key(story_content, col_width):
-    """Generate a cache key for wrapped text."""
-    # Include both content and column width in cache key
-    content_hash = hashlib.md5(story_content.encode('utf-8')).hexdigest()
-    return f"{content_hash}_{col_width}"
+def _wrap_story(story, col_width):
+    """Wrap a story's paragraphs to col_width, with a blank line between paragraphs."""
+    return list(_iter_wrapped(story, col_width))
+
+def _iter_wrapped(text, col_width, start=0, stop=None):
+    """Yield wrapped lines of text[start:stop] one paragraph at a time, with a blank line between paragraphs.
+    
+    Only one paragraph is sliced out at a time, so a lazily wrapped column
+    never holds a copy of its half of the text.
+    """
+    wrapper = textwrap.TextWrapper(width=col_width)
+    stop = len(text) if stop is None else stop
+    while True:
+        end = text.find('\n', start, stop)
+        paragraph = text[start:stop] if end < 0 else text[start:end]
+        yield from wrapper.wrap(paragraph)
+        if end < 0:
+            return
+        yield ""
+        start = end + 1
+
+def _column_split(story):
+    """Character offset where the right column starts in a lazily wrapped story.
+    
+    Roughly the middle of the text, moved to the nearest paragraph break (or
+    else the nearest space) so the right column starts on a clean line.
+    """
+    middle = len(story) // 2
+    window = max(1, len(story) // 10)
+    for separator in ('\n', ' '):
+        before = story.rfind(separator, max(0, middle - window), middle)
+        after = story.find(separator, middle, middle + window)
+        candidates = [pos for pos in (before, after) if pos >= 0]
+        if candidates:
+            return min(candidates, key=lambda pos: abs(pos - middle)) + 1
+    return middle
+
+class StoryRows:
+    """The two-column rows of one story at one column width, formatted on demand.
+    
+    The left column runs down the first half of the story and the right
+    column down the second; landmarks alternate per row so the eye can follow
+    a row across. Short stories are wrapped up front and split exactly at
+    the middle line. Longer ones are split at about the middle character and
+    both halves are wrapped lazily, so showing the first screen does not
+    depend on the length of the document.
+    
+    size_bytes counts the formatted rows plus, until both columns are used
+    up, the story text the wrappers still hold on to.
+    """
+    
+    def __init__(self, story, col_width):
+        self.col_width = col_width
+        self.rows = []
+        self.complete = False
+        self._rows_bytes = 0
+        self._source_bytes = sys.getsizeof(story)
+        self._blank = " " * (col_width * 2 + 4)
+        if len(story) <= EAGER_WRAP_CHARS:
+            lines = _wrap_story(story, col_width)
+            half = (len(lines) + 1) // 2
+            self._left, self._right = iter(lines[:half]), iter(lines[half:])
+        else:
+            split = _column_split(story)
+            self._left = _iter_wrapped(story, col_width, 0, split)
+            self._right = _iter_wrapped(story, col_width, split)
+    
+    def __len__(self):
+        return len(self.rows)
+    
+    @property
+    def size_bytes(self):
+        return self._rows_bytes + self._source_bytes
+    
+    def ensure(self, count):
+        """Format rows until there are at least count of them (or the story ends)."""
+        while len(self.rows) < count and not self.complete:
+            first_col = next(self._left, None)
+            second_col = next(self._right, None)
+            if first_col is None and second_col is None:
+                # Let go of the wrappers and the text they reference
+                self.complete = True
+                self._left = self._right = None
+                self._source_bytes = 0
+                break
+            first_col = first_col or ""
+            second_col = second_col or ""
+            if len(self.rows) % 2 == 0:
+                left_landmark, middle_landmark, right_landmark = EVEN_LANDMARK, ODD_LANDMARK, EVEN_LANDMARK
+            else:
+                left_landmark, middle_landmark, right_landmark = ODD_LANDMARK, EVEN_LANDMARK, ODD_LANDMARK
+            if not first_col.strip() and not second_col.strip():
+                row = self._blank
+            else:
+                row = (
+                    f"{left_landmark}  {first_col.ljust(self.col_width)}"
+                    f"{middle_landmark}  {second_col.ljust(self.col_width)}"
+                    f"{right_landmark}"
+                )
+            self.rows.append(row)
+            self._rows_bytes += sys.getsizeof(row)
+        return len(self.rows)
 
-def _get_wrapped_lines(story, col_width):
-    """Get wrapped lines for a story, using cache if available."""
-    cache_key = _get_cache_key(story, col_width)
+def _get_story_rows(story_id, story, col_width):
+    """Get the StoryRows for a story, using cache if available.
     
-    if cache_key not in _wrapped_cache:
-        # Compute wrapped lines
-        wrapper = textwrap.TextWrapper(width=col_width)
-        paragraphs = story.split('\n')
-        wrapped_lines = []
-        for paragraph in paragraphs:
-            wrapped_lines.extend(wrapper.wrap(paragraph))
-            wrapped_lines.append("")
-        if wrapped_lines and wrapped_lines[-1] == "":
-            wrapped_lines.pop()
-        _wrapped_cache[cache_key] = wrapped_lines
+    Rows are cached per (story_id, col_width), least recently used first out
+    once ROWS_CACHE_BYTES is exceeded. A resize only costs a reflow when the
+    story is shown at the new width. Stories without an id are not cached.
+    """
+    cache_key = (story_id, col_width)
+    rows = _rows_cache.get(cache_key) if story_id is not None else None
+    if rows is not None:
+        _rows_cache.move_to_end(cache_key)
+        return rows
     
-    return _wrapped_cache[cache_key]
+    rows = StoryRows(story, col_width)
+    if story_id is not None:
+        _rows_cache[cache_key] = rows
+        # Entries grow as they are scrolled, so add the sizes up here
+        total = sum(entry.size_bytes for entry in _rows_cache.values())
+        while total > ROWS_CACHE_BYTES and len(_rows_cache) > 1:
+            _, evicted = _rows_cache.popitem(last=False)
+            total -= evicted.size_bytes
+    return rows
 
-def display_story(stdscr, title, story, story_index, issue_date, offset=0, knn_results=None):
+def display_story(stdscr, title, story, story_index, issue_date, offset=0, knn_results=None, story_id=None):
     """
     Returns one of:
       - "back" if user pressed q
@@ -68,68 +182,68 @@ def display_story(stdscr, title, story, story_index, issue_date, offset=0, knn_r
         issue_date: The story's issue date (YYYYMMDD string/int or date object) used for display.
         knn_results: If not None, indicates we're viewing a story from KNN results.
                     When Q is pressed, should return to KNN results list.
+        story_id: The story's ID, used to cache its formatted rows.
     """
     curses.curs_set(0)
-    h, w = stdscr.getmaxyx()
     margin = 4
-    even_landmark = "♦︎"
-    odd_landmark = "♢"
     formatted_issue_date = _format_issue_date(issue_date)
-
-    col_width = (w - margin * 2 - 4) // 2
-    # Get wrapped lines from cache (or compute and cache)
-    wrapped_lines = _get_wrapped_lines(story, col_width)
-    
-    total_rows = (len(wrapped_lines) + 1) // 2
+    # Rows are drawn once into a pad; scrolling only changes which part of
+    # the pad is copied to the screen, so each step writes one new row.
+    # Rows are formatted (and drawn) one screen ahead of the view. The pad
+    # is PAD_SCREENS screens tall and starts at row `base` of the story;
+    # when the view nears either end it is re-based around the view and
+    # only that window of rows is drawn again.
+    stdscr.idlok(True)
+    pad = None
 
     while True:
-        stdscr.clear()
-        stdscr.addstr(0, margin, f"{story_index+1}: {title} - {formatted_issue_date}", curses.A_BOLD)
-
-        for i in range(1, h - 1):
-            row_idx = i - 1 + offset
-            if row_idx < total_rows:
-                # Landmarks
-                if row_idx % 2 == 0:
-                    left_landmark, middle_landmark, right_landmark = even_landmark, odd_landmark, even_landmark
-                else:
-                    left_landmark, middle_landmark, right_landmark = odd_landmark, even_landmark, odd_landmark
-
-                # First column
-                if row_idx < len(wrapped_lines):
-                    first_col = wrapped_lines[row_idx].ljust(col_width)
-                else:
-                    first_col = "".ljust(col_width)
-
-                # Second column
-                second_col_idx = row_idx + total_rows
-                if second_col_idx < len(wrapped_lines):
-                    second_col = wrapped_lines[second_col_idx].ljust(col_width)
-                else:
-                    second_col = "".ljust(col_width)
-
-                if not first_col.strip() and not second_col.strip():
-                    formatted_line = " " * (col_width * 2 + 4)
-                else:
-                    formatted_line = (
-                        f"{left_landmark}  {first_col}"
-                        f"{middle_landmark}  {second_col}"
-                        f"{right_landmark}"
-                    )
-                stdscr.addstr(i, margin, formatted_line)
-
-        stdscr.addstr(
-            h - 1,
-            0,
-            "Use UP/DOWN/j/k to scroll, 'q' to go back, ESC to exit, : for commands (use :k<N> for similar stories)."
-        )
-        stdscr.refresh()
+        if pad is None:
+            # First draw, or the terminal was resized / drawn over
+            h, w = stdscr.getmaxyx()
+            col_width = max(1, (w - margin * 2 - 4) // 2)
+            rows = _get_story_rows(story_id, story, col_width)
+            view_height = max(1, h - 2)
+            pad_rows = view_height * PAD_SCREENS
+            # Extra width and a spare row so the last cell is never written
+            pad = curses.newpad(pad_rows + 1, w + 8)
+            base = drawn = 0
+
+            # clear() rather than erase(): repaint the terminal in full once, so
+            # landmark glyphs some terminals draw wider cannot leave stale cells
+            stdscr.clear()
+            stdscr.addnstr(0, margin, f"{story_index+1}: {title} - {formatted_issue_date}", max(0, w - margin - 1), curses.A_BOLD)
+            stdscr.addnstr(
+                h - 1,
+                0,
+                "Use UP/DOWN/j/k to scroll, 'q' to go back, ESC to exit, : for commands (:k<N> similar stories, :s <words> search).",
+                max(0, w - 1)
+            )
+            stdscr.noutrefresh()
+
+        rows.ensure(offset + view_height * 2)
+        offset = max(0, min(offset, len(rows) - view_height))
+        if offset < base or offset + view_height > base + pad_rows:
+            # Re-base with a screen of margin above the view
+            base = drawn = max(0, offset - view_height)
+            pad.erase()
+        end = min(len(rows), base + pad_rows)
+        for i in range(drawn, end):
+            try:
+                pad.addstr(i - base, margin, rows.rows[i])
+            except curses.error:
+                pass  # wide characters ran past the pad; the rest of the row is cut off
+        drawn = max(drawn, end)
+
+        pad.noutrefresh(offset - base, 0, 1, 0, min(view_height, max(1, len(rows))), w - 1)
+        curses.doupdate()
 
         key = stdscr.getch()
         if key in (curses.KEY_UP, ord('k')) and offset > 0:
             offset -= 1
-        elif key in (curses.KEY_DOWN, ord('j')) and offset < total_rows - (h - 2):
+        elif key in (curses.KEY_DOWN, ord('j')) and offset < len(rows) - view_height:
             offset += 1
+        elif key == curses.KEY_RESIZE:
+            pad = None
         elif key in [ord('q'), ord('Q')]:
             return "back"
         elif key == 27:  # ESC
@@ -137,6 +251,7 @@ def display_story(stdscr, title, story, story_index, issue_date, offset=0, knn_r
         elif key == ord(':'):
             command = command_mode(stdscr)
             if command is None:
+                pad = None  # the prompt drew over the footer
                 continue
             # Return the command with current offset so we can re-display
             return ("command", command, offset)